@@ -1,11 +1,27 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from services.ann_index import QUANTIZATIONS
+from services.answer_cache import AnswerCache
+from services.chunker import Chunker
+from services.context_builder import ContextBuilder
 from services.file_reader import FileReader
+from services.ingestion_queue import IngestionQueue
+from services.lazy_model import LazyModel
+from services.llm_client import OllamaClient
+from services.metrics import metrics
+from services.micro_batcher import MicroBatcher
+from services.reranker import Reranker
 from services.vector_store import VectorStore
 import logging
 from typing import List
-import subprocess
 import traceback
+import asyncio
+import json
+import math
+import os
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,14 +36,178 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize services
-file_reader = FileReader()
-vector_store = VectorStore()
+# Per-stage latency histograms and counters on /metrics, optionally also as a
+# Server-Timing header on every response
+metrics.enabled = os.getenv("METRICS_ENABLED", "1") == "1"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+HTTP_REQUESTS = metrics.histogram("http_request_seconds", "Time to response headers, by route", labels=("method", "route", "status"))
+CONTEXT_TOKENS = metrics.counter("context_tokens_total", "Tokens of retrieved context put into prompts")
+ANSWERS = metrics.counter("answers_total", "Answers served, by how they were produced", labels=("source",))
 
-@app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    if not metrics.enabled:
+        return await call_next(request)
+
+    # Spans recorded while serving the request (including in worker threads) land in its trace
+    trace = metrics.start_trace()
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUESTS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(trace)
+    return response
+
+
+# One writer process owns uploads, deletions and index maintenance; any number of
+# reader processes (e.g. uvicorn --workers N) serve queries from the same directory
+VECTOR_STORE_ROLE = os.getenv("VECTOR_STORE_ROLE", "writer")
+if VECTOR_STORE_ROLE not in ("writer", "reader"):
+    raise ValueError(f"Unsupported VECTOR_STORE_ROLE: {VECTOR_STORE_ROLE}. Supported roles are: writer, reader")
+
+# Initialize services. Models load on first use (or in the background from startup when
+# MODEL_WARMUP=1) and the stored index loads in the background, so importing the app and
+# serving /ready does not wait for torch or for the index
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+vector_store = VectorStore(
+    embedding_backend=os.getenv("EMBEDDING_BACKEND", "sentence_transformers"),
+    embedding_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
+    embedding_quantize=os.getenv("EMBEDDING_QUANTIZE", "0") == "1",
+    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+    storage_dir=os.getenv("VECTOR_STORE_DIR", "vector_store"),
+    mmap_index=os.getenv("VECTOR_STORE_MMAP", "1") == "1",
+    index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"),
+    nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "16")),
+    ef_search=int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64")),
+    filter_exact_limit=int(os.getenv("FILTER_EXACT_LIMIT", "5000")),
+    quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+    rescore=int(os.getenv("VECTOR_RESCORE", "0")),
+    metric=os.getenv("VECTOR_METRIC", "cosine"),
+    min_similarity=float(os.getenv("MIN_SIMILARITY")) if os.getenv("MIN_SIMILARITY") else None,
+    adaptive_k_gap=float(os.getenv("ADAPTIVE_K_GAP")) if os.getenv("ADAPTIVE_K_GAP") else None,
+    cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    cache_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+    compress_metadata=os.getenv("METADATA_COMPRESSION", "0") == "1",
+    metadata_text_path=os.getenv("METADATA_TEXT_PATH") or None,
+    search_mode=os.getenv("SEARCH_MODE", "hybrid"),
+    lexical_candidates=int(os.getenv("LEXICAL_CANDIDATES", "1000")),
+    read_only=VECTOR_STORE_ROLE == "reader",
+    refresh_interval=float(os.getenv("VECTOR_STORE_REFRESH_INTERVAL", "1")),
+    background_load=True,
+)
+
+
+def build_chunker():
+    """Chunks measured in embedding-model tokens by default, so none is truncated by the encoder."""
+    if os.getenv("CHUNK_UNIT", "tokens") == "chars":
+        return Chunker(
+            max_size=int(os.getenv("CHUNK_SIZE", "1000")),
+            overlap=int(os.getenv("CHUNK_OVERLAP", "200")),
+        )
+
+    def token_chunker():
+        # Leave room for the [CLS]/[SEP] tokens the encoder adds
+        max_tokens = int(os.getenv("CHUNK_SIZE", "0")) or vector_store.model.max_seq_length - 2
+        return Chunker.from_tokenizer(
+            vector_store.model.tokenizer,
+            max_tokens=max_tokens,
+            overlap=int(os.getenv("CHUNK_OVERLAP", "32")),
+        )
+
+    # Needs the embedding model's tokenizer, so it is built when the model is first used
+    return LazyModel("token chunker", token_chunker)
+
+
+file_reader = FileReader(
+    max_workers=int(os.getenv("PDF_WORKERS", "0")) or None,
+    pages_per_shard=int(os.getenv("PDF_PAGES_PER_SHARD", "16")),
+    chunker=build_chunker(),
+)
+
+# Answers reused for paraphrased queries that retrieve the same chunks
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+) if int(os.getenv("ANSWER_CACHE_SIZE", "1000")) else None
+
+
+def invalidate_answers(job: dict):
+    """Drops cached answers built from documents that were just uploaded again or replaced."""
+    if answer_cache:
+        answer_cache.invalidate(
+            file_ids=job["replaced_file_ids"],
+            filenames=[f["filename"] for f in job["files"] if f["status"] == "success"],
+        )
+
+
+ingestion_queue = IngestionQueue(
+    file_reader,
+    vector_store,
+    workers=int(os.getenv("INGEST_WORKERS", "2")),
+    max_queue=int(os.getenv("INGEST_QUEUE_SIZE", "16")),
+    on_complete=invalidate_answers,
+)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+# Optional cross-encoder stage: retrieve RERANK_CANDIDATES chunks, keep the best RERANK_TOP_N
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+reranker = Reranker(RERANKER_MODEL, batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32"))) if RERANKER_MODEL else None
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+
+# Token budget for the retrieved context in the prompt
+context_builder = ContextBuilder(max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "2048")))
+
+llm_client = OllamaClient(
+    base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+    model=os.getenv("OLLAMA_MODEL", "llama3"),
+)
+
+
+def lazy_models() -> List[LazyModel]:
+    candidates = [vector_store.model, file_reader.chunker, reranker.model if reranker else None]
+    return [model for model in candidates if isinstance(model, LazyModel)]
+
+
+@app.on_event("startup")
+async def startup():
+    if not vector_store.read_only:
+        file_reader.remove_uploads(UPLOAD_DIR)
+        await ingestion_queue.start()
+    if MODEL_WARMUP:
+        for model in lazy_models():
+            model.warm_up()
+
+
+def require_writer():
+    if vector_store.read_only:
+        raise HTTPException(status_code=409, detail="This worker is read-only; send writes to the writer process")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ingestion_queue.stop()
+    await llm_client.close()
+    file_reader.close()
+    # Checkpoint the index so the next start does not replay the vector log
+    vector_store.close()
+
+@app.post("/upload", status_code=202)
+async def upload_files(files: List[UploadFile] = File(...), replaces: List[str] = Form([])):
+    # ``replaces`` names stored file_ids the upload supersedes (e.g. the previous version
+    # of a document); they are deleted once every file of the job has been ingested
+    require_writer()
     results = []
     allowed_types = {"application/pdf", "text/plain"}
 
@@ -35,6 +215,19 @@ async def upload_files(files: List[UploadFile] = File(...)):
         logger.error("No files were uploaded")
         raise HTTPException(status_code=400, detail="No files were uploaded")
 
+    if replaces:
+        stored = {f["file_id"] for f in await run_in_threadpool(vector_store.list_files)}
+        unknown = [file_id for file_id in replaces if file_id not in stored]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown file_ids in replaces: {', '.join(unknown)}")
+
+    # Push back before writing anything to disk when the workers are saturated
+    if ingestion_queue.full():
+        raise HTTPException(status_code=429, detail="Ingestion queue is full, retry later", headers={"Retry-After": "5"})
+
+    queued = []
+    request_hashes = set()
+
     for file in files:
         logger.info(f"Processing file: {file.filename} of type {file.content_type}")
 
@@ -48,30 +241,29 @@ async def upload_files(files: List[UploadFile] = File(...)):
             continue
 
         try:
-            # Step 1: Read and chunk the file
-            text_chunks = await file_reader.read_file(file)
+            path, content_hash = await file_reader.save_upload(file, UPLOAD_DIR)
 
-            if not text_chunks:
-                logger.warning(f"No text extracted from file: {file.filename}")
+            # Skip files whose exact content has already been ingested
+            if await run_in_threadpool(vector_store.has_file, content_hash) or content_hash in request_hashes:
+                logger.info(f"Skipping duplicate file: {file.filename}")
+                os.remove(path)
                 results.append({
-                    "filename": file.filename, 
-                    "status": "warning", 
-                    "message": "No text could be extracted from the file"
+                    "filename": file.filename,
+                    "status": "duplicate",
+                    "message": "Identical content has already been uploaded"
                 })
                 continue
+            request_hashes.add(content_hash)
 
-            # Step 2: Store embeddings along with metadata
-            store_result = vector_store.store_embeddings(text_chunks)
-
-            results.append({
-                "filename": file.filename, 
-                "status": "success", 
-                "processed_chunks": store_result["processed_chunks"]
+            queued.append({
+                "path": path,
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "content_hash": content_hash
             })
-            logger.info(f"File processed successfully: {file.filename}")
 
         except Exception as e:
-            error_msg = f"Error processing file {file.filename}: {str(e)}\n{traceback.format_exc()}"
+            error_msg = f"Error saving file {file.filename}: {str(e)}\n{traceback.format_exc()}"
             logger.error(error_msg)
             results.append({
                 "filename": file.filename, 
@@ -79,54 +271,343 @@ async def upload_files(files: List[UploadFile] = File(...)):
                 "message": f"Failed to process file: {str(e)}"
             })
 
-    return {"message": "Files processed", "results": results}
+    if not queued:
+        return {"message": "No files to process", "job_id": None, "results": results}
+
+    try:
+        job = ingestion_queue.submit(queued, replaces=replaces)
+    except asyncio.QueueFull:
+        for f in queued:
+            os.remove(f["path"])
+        raise HTTPException(status_code=429, detail="Ingestion queue is full, retry later", headers={"Retry-After": "5"})
+
+    return {"message": "Files queued for processing", "job_id": job["job_id"], "results": results}
+
+
+@app.get("/jobs")
+def get_job_stats():
+    return ingestion_queue.get_stats()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id}")
+    return job
+
+
+def request_number(data: dict, key: str, cast=float, default=None, minimum=None):
+    """Reads an optional numeric field of a request body, answering 400 when it is not a valid number."""
+    value = data.get(key)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = cast(value)
+        if cast is float and not math.isfinite(number):
+            raise ValueError
+        if cast is int and number != float(value):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{key} must be {'an integer' if cast is int else 'a number'}, got {value!r}")
+    if minimum is not None and number < minimum:
+        raise HTTPException(status_code=400, detail=f"{key} must be at least {minimum}, got {value!r}")
+    return number
+
+
+def search_key(data: dict) -> tuple:
+    """Search parameters of an /answer request; requests sharing them can share a batch."""
+    top_k = RERANK_CANDIDATES if reranker else RERANK_TOP_N
+    return (
+        top_k, data.get("search_mode"), json.dumps(data.get("filters"), sort_keys=True),
+        request_number(data, "min_similarity"), request_number(data, "adaptive_k_gap", minimum=0),
+        request_number(data, "nprobe", int, minimum=1), request_number(data, "ef_search", int, minimum=1),
+    )
+
+
+def run_search_batch(key: tuple, queries: List[str]):
+    top_k, mode, filters, min_similarity, adaptive_k_gap, nprobe, ef_search = key
+    return vector_store.search_batch(
+        queries, top_k=top_k, nprobe=nprobe, ef_search=ef_search, mode=mode, filters=json.loads(filters),
+        min_similarity=min_similarity, adaptive_k_gap=adaptive_k_gap,
+    )
+
+
+# Concurrent /answer calls are coalesced into one encoder pass and one FAISS search
+search_batcher = MicroBatcher(
+    run_search_batch,
+    max_batch_size=int(os.getenv("SEARCH_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5")),
+)
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "4"))
 
 
 @app.post("/answer")
 async def answer_query(data: dict):
     query = data["query"]
 
-    # Step 1: Retrieve relevant chunks from vector store
-    results = vector_store.search(query, top_k=5)
+    timings = {}
+
+    # Step 1: Retrieve candidate chunks from vector store (off the event loop)
+    try:
+        with metrics.span("retrieval") as span:
+            results = await search_batcher.submit(search_key(data), query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timings["retrieval_ms"] = span.ms
 
     if not results:
-        return {"answer": "No relevant documents found.", "sources": []}
+        ANSWERS.inc(source="no_results")
+        return {"answer": "No relevant documents found.", "sources": [], "timings": timings}
+
+    # Step 2: Rerank the candidates with the cross-encoder and keep the best few
+    if reranker:
+        with metrics.span("rerank") as span:
+            results = await run_in_threadpool(reranker.rerank, query, results, top_n=RERANK_TOP_N)
+        timings["rerank_ms"] = span.ms
+
+    return await answer_from_results(query, results, timings, stream=data.get("stream"))
+
+
+@app.post("/answer/batch")
+async def answer_batch(data: dict):
+    """
+    Answers a list of queries: retrieval and reranking run once over all of them,
+    then up to BATCH_GENERATION_CONCURRENCY answers are generated at a time.
+    """
+    queries = data["queries"]
+    if not queries:
+        return {"answers": []}
+
+    try:
+        with metrics.span("retrieval") as span:
+            batch_results = await run_in_threadpool(run_search_batch, search_key(data), queries)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    retrieval_ms = span.ms
+
+    rerank_ms = None
+    if reranker:
+        with metrics.span("rerank") as span:
+            batch_results = await run_in_threadpool(reranker.rerank_batch, queries, batch_results, top_n=RERANK_TOP_N)
+        rerank_ms = span.ms
+
+    semaphore = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+    async def answer_one(query: str, results: list):
+        timings = {"retrieval_ms": retrieval_ms / len(queries)}
+        if rerank_ms is not None:
+            timings["rerank_ms"] = rerank_ms / len(queries)
+        if not results:
+            ANSWERS.inc(source="no_results")
+            return {"answer": "No relevant documents found.", "sources": [], "timings": timings}
+        async with semaphore:
+            return await answer_from_results(query, results, timings)
+
+    answers = await asyncio.gather(*(answer_one(query, results) for query, results in zip(queries, batch_results)))
+    return {"answers": [{"query": query, **answer} for query, answer in zip(queries, answers)]}
 
-    # Convert any numpy.float32 values to Python float
-    #for res in results:
-    #    res["page_number"] = int(res["page_number"])  # Ensure it's an int
-    #    res["distance"] = float(res["distance"])      # Ensure it's a float
+
+async def answer_from_results(query: str, results: list, timings: dict, stream: bool = False):
+    """Builds the prompt from the retrieved chunks and generates (or reuses) the answer."""
+    # Step 3: Pack the best chunks into the context budget, dropping repeated sentences
+    with metrics.span("context_build"):
+        packed = context_builder.build(results)
+    context = packed["context"]
+    timings["context_tokens"] = packed["tokens"]
+    CONTEXT_TOKENS.inc(packed["tokens"])
+    logger.info(
+        f"Context uses {packed['tokens']} tokens from {len(packed['chunks'])} chunks "
+        f"({packed['deduplicated_chunks']} deduplicated, {packed['trimmed_chunks']} trimmed, {packed['dropped_chunks']} dropped)"
+    )
 
     sources = "\n".join([
         f"Source: {res['filename']} (Page {res['page_number']})" 
-        for res in results
+        for res in packed["chunks"]
     ])
 
-    # Step 2: Prepare context for the LLM
-    context = "\n".join([
-        f"Source: {res['filename']} (Page {res['page_number']})\n{res['text']}" 
-        for res in results
-    ])
+    full_prompt = f"Break down the following context into individual parts, analyse each part in complete detail and then answer the query by looking at the individual parts. Ensure that the answer is well detailed based on the breakdown of the context and the question {context}\nQuestion: {query}\nAnswer:"
 
+    # Step 4: Reuse the answer to a similar query over the same chunks
+    query_embedding = None
+    if answer_cache:
+        with metrics.span("answer_cache"):
+            query_embedding = await run_in_threadpool(vector_store.generate_embedding, query)
+            cached = answer_cache.get(query_embedding, [res["chunk_id"] for res in results])
+        if cached:
+            timings["cache"] = "hit"
+            ANSWERS.inc(source="cache")
+            if stream:
+                return StreamingResponse(stream_cached_answer(cached["answer"], cached["sources"], timings), media_type="text/event-stream")
+            return {"answer": cached["answer"], "sources": cached["sources"], "timings": timings, "cached": True}
 
-    full_prompt = f"Break down the following context into individual parts, analyse each part in complete detail and then answer the query by looking at the individual parts. Ensure that the answer is well detailed based on the breakdown of the context and the question {context}\nQuestion: {query}\nAnswer:"
+    def remember(answer: str, generation_ms: float):
+        if answer_cache:
+            answer_cache.put(query_embedding, results, {"answer": answer, "sources": sources}, generation_ms)
+
+    # Step 5: Run LLM, streaming tokens as server-sent events when requested
+    if stream:
+        return StreamingResponse(stream_answer(full_prompt, sources, timings, remember), media_type="text/event-stream")
 
-    # Step 3: Run LLM
     try:
-        process = subprocess.Popen(
-            ["ollama", "run", "llama3", full_prompt],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        output, error = process.communicate()
+        with metrics.span("generation") as span:
+            answer = await llm_client.generate(full_prompt)
+        timings["generation_ms"] = span.ms
+        ANSWERS.inc(source="generated")
+        logger.info(f"Answered query with timings {timings}")
+        remember(answer.strip(), timings["generation_ms"])
+        return {"answer": answer.strip(), "sources": sources, "timings": timings}
+    except Exception as e:
+        return {"error": str(e)}
 
-        if error:
-            return {"error": error.strip()}
 
-        return {"answer": output.strip(), "sources": sources}
+async def stream_answer(full_prompt: str, sources: str, timings: dict, on_complete=None):
+    """Yields the answer as SSE events: sources first, then one event per token."""
+    yield f"event: sources\ndata: {json.dumps({'sources': sources, 'timings': timings})}\n\n"
+    tokens = []
+    try:
+        with metrics.span("generation") as span:
+            async for token in llm_client.stream(full_prompt):
+                tokens.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+        ANSWERS.inc(source="generated")
+        if on_complete:
+            on_complete("".join(tokens).strip(), span.ms)
     except Exception as e:
-        return {"error": str(e)}
+        logger.error(f"Streaming generation failed: {e}")
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+
+async def stream_cached_answer(answer: str, sources: str, timings: dict):
+    """Yields a cached answer with the same SSE events as stream_answer, as a single token."""
+    yield f"event: sources\ndata: {json.dumps({'sources': sources, 'timings': timings})}\n\n"
+    yield f"data: {json.dumps({'token': answer})}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+
+@app.get("/documents")
+def list_documents():
+    return {"documents": vector_store.list_files()}
 
 
+@app.delete("/documents/{file_id}")
+def delete_document(file_id: str):
+    require_writer()
+    result = vector_store.delete_file(file_id)
+    if not result["deleted_chunks"]:
+        raise HTTPException(status_code=404, detail=f"No document with file_id {file_id}")
+    if answer_cache:
+        answer_cache.invalidate(file_ids=[file_id])
+    return result
 
+
+@app.get("/ready")
+def readiness():
+    """
+    Reports model and index load state; 503 until the index and lexical index are loaded
+    and, with MODEL_WARMUP=1, every model. Without the warm-up models load on first use,
+    so they do not hold back readiness.
+    """
+    models = [model.get_status() for model in lazy_models()]
+    index = vector_store.get_index_info()
+    ready = (
+        index["state"] == "ready"
+        and index["lexical"]["state"] == "ready"
+        and (not MODEL_WARMUP or all(model["state"] == "ready" for model in models))
+    )
+    body = {
+        "ready": ready,
+        "models": models,
+        "index": {
+            **{key: index[key] for key in ("state", "index_type", "vectors", "migrating", "load_seconds")},
+            "lexical": index["lexical"]["state"],
+        },
+    }
+    return body if ready else JSONResponse(body, status_code=503)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Counters and latency histograms in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/embeddings")
+def embedding_stats():
+    return vector_store.get_embedding_stats()
+
+
+@app.get("/stats/answer_cache")
+def answer_cache_stats():
+    if not answer_cache:
+        raise HTTPException(status_code=404, detail="The answer cache is disabled")
+    return answer_cache.get_stats()
+
+
+@app.get("/stats/search_batching")
+def search_batching_stats():
+    return search_batcher.get_stats()
+
+
+@app.get("/stats/reranker")
+def reranker_stats():
+    if not reranker:
+        raise HTTPException(status_code=404, detail="Reranking is disabled")
+    return reranker.get_stats()
+
+
+@app.get("/index")
+def index_info():
+    return vector_store.get_index_info()
+
+
+@app.post("/index/migrate")
+def migrate_index(data: dict):
+    index_type = data["index_type"]
+    params = {key: int(data[key]) for key in ("nlist", "pq_m", "hnsw_m") if data.get(key)}
+    for key in ("quantization", "metric"):
+        if data.get(key):
+            params[key] = data[key]
+
+    try:
+        vector_store.migrate_index(index_type, background=True, **params)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {"message": f"Migration to {index_type} started", **vector_store.get_index_info()}
+
+
+@app.post("/index/compact")
+def compact_index():
+    try:
+        vector_store.compact(background=True)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {"message": "Compaction started", **vector_store.get_index_info()}
+
+
+@app.post("/index/recall")
+def index_recall(data: dict):
+    return vector_store.recall_report(
+        queries=data.get("queries"),
+        k=request_number(data, "k", int, default=10, minimum=1),
+        sample_size=request_number(data, "sample_size", int, default=100, minimum=1),
+    )
+
+
+@app.post("/index/quantization")
+def index_quantization(data: dict):
+    try:
+        return vector_store.quantization_report(
+            queries=data.get("queries"),
+            k=request_number(data, "k", int, default=10, minimum=1),
+            sample_size=request_number(data, "sample_size", int, default=100, minimum=1),
+            quantizations=data.get("quantizations") or QUANTIZATIONS,
+            rescore_factors=[int(factor) for factor in data.get("rescore_factors", [4])],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,102 @@
+"""
+Synthetic corpus generator for the benchmarks.
+
+Documents are built from a fixed random vocabulary with a few topic words per
+document, so queries made of topic words have well-defined relevant documents.
+PDFs are written directly in PDF syntax, so no PDF library is needed.
+"""
+import os
+import random
+import textwrap
+from typing import List, Dict, Any
+
+
+class SyntheticCorpus:
+    def __init__(self, seed: int = 0, vocabulary_size: int = 20000, topic_words: int = 8):
+        self.rng = random.Random(seed)
+        self.vocabulary = [self._word() for _ in range(vocabulary_size)]
+        self.topic_words = topic_words
+
+    def _word(self) -> str:
+        return "".join(self.rng.choices("abcdefghijklmnopqrstuvwxyz", k=self.rng.randint(2, 11)))
+
+    def sentence(self, topic: List[str]) -> str:
+        words = [self.rng.choice(topic) if self.rng.random() < 0.15 else self.rng.choice(self.vocabulary) for _ in range(self.rng.randint(8, 24))]
+        return " ".join(words).capitalize() + "."
+
+    def document(self, pages: int, page_chars: int = 2500) -> Dict[str, Any]:
+        """Returns a document: its topic words and the text of each page."""
+        topic = self.rng.sample(self.vocabulary, self.topic_words)
+        texts = []
+        for _ in range(pages):
+            sentences, length = [], 0
+            while length < page_chars:
+                sentence = self.sentence(topic)
+                sentences.append(sentence)
+                length += len(sentence) + 1
+            texts.append(" ".join(sentences))
+        return {"topic": topic, "pages": texts}
+
+    def queries(self, documents: List[Dict[str, Any]], count: int, words: int = 4) -> List[str]:
+        """Queries made of topic words of randomly chosen documents."""
+        return [" ".join(self.rng.sample(self.rng.choice(documents)["topic"], words)) for _ in range(count)]
+
+    def write(self, directory: str, documents: int, pages_per_document: int, kind: str = "pdf") -> List[Dict[str, Any]]:
+        """
+        Writes ``documents`` files of ``kind`` ("pdf" or "txt") into ``directory``.
+
+        Returns:
+            One dict per file with path, filename, content_type, pages and topic.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for i in range(documents):
+            doc = self.document(pages_per_document)
+            filename = f"doc_{i:05d}.{kind}"
+            path = os.path.join(directory, filename)
+            if kind == "pdf":
+                write_pdf(path, doc["pages"])
+                content_type = "application/pdf"
+            else:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n\n".join(doc["pages"]))
+                content_type = "text/plain"
+            files.append({"path": path, "filename": filename, "content_type": content_type, "pages": pages_per_document, "topic": doc["topic"]})
+        return files
+
+
+def write_pdf(path: str, pages: List[str], line_chars: int = 90):
+    """Writes a minimal PDF with one page per text, in Helvetica."""
+    objects = []  # object bodies, numbered from 1
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_ref = add(b"")  # filled in once the page ids are known
+    page_ids = []
+    for text in pages:
+        lines = textwrap.wrap(text, line_chars)
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_ref, font, content)
+        ))
+    objects[pages_ref - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
@@ -0,0 +1,110 @@
+"""
+Checks that the ONNX Runtime embedding backend reproduces the PyTorch one, and
+compares their encoding throughput.
+
+The same texts (fixed sentences, plus synthetic passages long enough to be
+truncated) are encoded by the sentence_transformers backend and by the onnx
+backend, in fp32 and, with --int8, with int8-quantized weights. For each ONNX
+variant it reports the cosine similarity of every embedding to the PyTorch one,
+the largest absolute difference, how many of each text's nearest neighbours
+agree, and texts/s. The exit status is 1 if a variant falls below its
+tolerance, so the check can gate a deployment. Run from the backend directory:
+
+    python -m benchmarks.embedding_parity --model all-MiniLM-L6-v2 --int8 --threads 4
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from services.embedding_backends import load_embedding_backend
+from benchmarks.corpus import SyntheticCorpus
+
+SENTENCES = [
+    "How do I reset the controller to its factory settings?",
+    "The maximum operating temperature of the XR-200 module is 85 degrees Celsius.",
+    "Quarterly revenue grew by 12% compared to the same period last year.",
+    "Replace the filter cartridge every six months or after 500 hours of use.",
+    "What is the warranty period for spare parts?",
+    "The API returns a 429 status code when the rate limit is exceeded.",
+    "Ensure the power supply is disconnected before opening the housing.",
+    "Employees may carry over up to five days of unused leave.",
+]
+
+
+def texts_for(args):
+    corpus = SyntheticCorpus(seed=args.seed)
+    texts = list(SENTENCES)
+    while len(texts) < args.texts:
+        # Passages from a sentence to well beyond the model window, to cover truncation
+        document = corpus.document(pages=1, page_chars=corpus.rng.choice([100, 400, 1500, 4000]))
+        texts.append(document["pages"][0])
+    return texts[:args.texts]
+
+
+def encode(backend, texts, batch_size):
+    backend.encode(texts[:batch_size], batch_size=batch_size)  # Warm-up
+    started = time.perf_counter()
+    embeddings = backend.encode(texts, batch_size=batch_size)
+    return np.asarray(embeddings, dtype=np.float32), len(texts) / (time.perf_counter() - started)
+
+
+def neighbours(embeddings, k):
+    normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    similarities = normalized @ normalized.T
+    np.fill_diagonal(similarities, -np.inf)
+    return np.argsort(-similarities, axis=1)[:, :k]
+
+
+def compare(reference, embeddings, k):
+    cosine = (reference * embeddings).sum(axis=1) / np.maximum(
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1), 1e-12
+    )
+    expected, found = neighbours(reference, k), neighbours(embeddings, k)
+    agreement = np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(reference - embeddings).max()),
+        f"neighbours_at_{k}": float(agreement),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, help="Inference threads for every backend")
+    parser.add_argument("--int8", action="store_true", help="Also check the int8-quantized ONNX model")
+    parser.add_argument("--min-cosine", type=float, default=0.999, help="Tolerance for the fp32 ONNX model")
+    parser.add_argument("--min-cosine-int8", type=float, default=0.98, help="Tolerance for the int8 ONNX model")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per text")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = texts_for(args)
+    reference, reference_rate = encode(load_embedding_backend("sentence_transformers", args.model, threads=args.threads), texts, args.batch_size)
+    report = {
+        "model": args.model,
+        "texts": len(texts),
+        "threads": args.threads,
+        "sentence_transformers": {"texts_per_second": reference_rate},
+    }
+
+    passed = True
+    variants = [("onnx", False, args.min_cosine)] + ([("onnx_int8", True, args.min_cosine_int8)] if args.int8 else [])
+    for name, quantize, tolerance in variants:
+        embeddings, rate = encode(load_embedding_backend("onnx", args.model, threads=args.threads, quantize=quantize), texts, args.batch_size)
+        result = {**compare(reference, embeddings, args.k), "texts_per_second": rate, "speedup": rate / reference_rate, "tolerance": tolerance}
+        result["passed"] = result["min_cosine"] >= tolerance
+        passed = passed and result["passed"]
+        report[name] = result
+        print(f"{name}: min cosine {result['min_cosine']:.5f} (tolerance {tolerance}), {rate:.1f} texts/s", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
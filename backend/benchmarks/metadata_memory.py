@@ -0,0 +1,127 @@
+"""
+Measures the memory held by chunk metadata, per chunk and extrapolated to one
+million chunks, for the old dict-per-chunk layout and the compact ChunkTable
+(plain, zlib-compressed texts, and texts in a memory-mapped file).
+
+Run from the backend directory:
+
+    python -m benchmarks.metadata_memory --chunks 100000
+"""
+import os
+import gc
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from services.metadata_store import MetadataStore
+
+
+def synthetic_entries(n_chunks: int, chunk_chars: int, chunks_per_file: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10))) for _ in range(5000)]
+    file_id = filename = file_hash = None
+    for i in range(n_chunks):
+        if i % chunks_per_file == 0:
+            file_id = str(uuid.uuid4())
+            filename = f"document_{i // chunks_per_file}.pdf"
+            file_hash = hashlib.sha256(file_id.encode()).hexdigest()
+        words = []
+        length = 0
+        while length < chunk_chars:
+            word = rng.choice(vocabulary)
+            words.append(word)
+            length += len(word) + 1
+        text = " ".join(words)
+        yield {
+            "id": str(uuid.uuid4()),
+            "filename": filename,
+            "page_number": i % chunks_per_file + 1,
+            "text": text,
+            "file_id": file_id,
+            "chunk_hash": hashlib.sha256(text.encode()).hexdigest(),
+            "file_hash": file_hash,
+            "uploaded_at": time.time(),
+        }
+
+
+def measure(build, make_entries):
+    """Builds a store from freshly generated entries and returns it with the memory it retains."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = build(make_entries())
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, current, elapsed
+
+
+def dict_rows(entries):
+    return dict(enumerate(entries))
+
+
+def compact(batch_size: int = 10000, **options):
+    def build(entries):
+        store = MetadataStore(**options)
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) == batch_size:
+                store.extend(range(len(store), len(store) + len(batch)), batch)
+                batch = []
+        store.extend(range(len(store), len(store) + len(batch)), batch)
+        return store
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Entries are generated while tracing, so each figure is what the layout retains
+    make_entries = lambda: synthetic_entries(args.chunks, args.chunk_chars, args.chunks_per_file)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        layouts = {
+            "dict_per_chunk": dict_rows,
+            "compact": compact(),
+            "compact_compressed": compact(compress=True),
+            "compact_mmap_texts": compact(text_path=os.path.join(tmp, "texts.bin")),
+        }
+
+        report = {"chunks": args.chunks, "chunk_chars": args.chunk_chars, "layouts": {}}
+        for name, build in layouts.items():
+            store, resident, elapsed = measure(build, make_entries)
+
+            sample = random.Random(1).sample(range(args.chunks), min(args.lookups, args.chunks))
+            started = time.perf_counter()
+            for chunk_id in sample:
+                store[chunk_id]
+            lookup_us = (time.perf_counter() - started) * 1e6 / len(sample)
+
+            report["layouts"][name] = {
+                "resident_bytes": resident,
+                "bytes_per_chunk": resident / args.chunks,
+                "resident_mb_per_million_chunks": resident / args.chunks * 1e6 / 2**20,
+                "build_seconds": elapsed,
+                "lookup_us": lookup_us,
+            }
+            if isinstance(store, MetadataStore):
+                report["layouts"][name]["breakdown"] = store.memory_usage()
+                store.close()
+            del store
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Ingestion and retrieval benchmark on a synthetic corpus.
+
+Measures, with an offline hashing embedder by default (so no model weights or
+network are needed):
+
+* ingestion: synthetic PDF / text files through FileReader.iter_path and
+  VectorStore.store_embeddings, in pages/s and chunks/s;
+* search: latency percentiles of VectorStore.search at each store size, for
+  every index type and search mode;
+* memory: process RSS, serialized index size and metadata footprint;
+* recall@k of each index type against exact search (VectorStore.recall_report);
+* memory saved and recall@k lost by each vector quantization, with and without
+  re-scoring (VectorStore.quantization_report).
+
+Results are written as JSON, so runs can be diffed for regressions. Run from
+the backend directory:
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --output bench.json
+"""
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+import faiss
+import numpy as np
+from services.ann_index import INDEX_TYPES, MIN_TRAIN_VECTORS, QUANTIZATIONS
+from services.chunker import Chunker
+from services.embedding_backends import EMBEDDING_BACKENDS, load_embedding_backend
+from services.file_reader import FileReader
+from services.vector_store import VectorStore, SEARCH_MODES
+from benchmarks.corpus import SyntheticCorpus
+from benchmarks.stub_embedder import HashingEmbedder
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (Linux), or the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def build_embedder(model_name: str, backend: str = "sentence_transformers", threads: int = None, quantize: bool = False):
+    if model_name == "hashing":
+        return HashingEmbedder()
+    return load_embedding_backend(backend, model_name, threads=threads, quantize=quantize)
+
+
+def new_store(embedder, storage_dir: str, **options) -> VectorStore:
+    # The embedding cache is off so repeated runs measure the encoder, not the cache
+    return VectorStore(
+        embedding_dimension=embedder.encode("dimension probe").shape[0],
+        storage_dir=storage_dir,
+        cache_size=0,
+        model=embedder,
+        **options,
+    )
+
+
+def index_size(index) -> int:
+    with tempfile.NamedTemporaryFile() as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name)
+
+
+async def ingest(file_reader: FileReader, vector_store: VectorStore, files):
+    """Ingests files the way the ingestion queue does: streamed chunks, embedded in batches."""
+    flush_size = vector_store.batch_size * 4
+    buffer = []
+    chunks = 0
+    for f in files:
+        with open(f["path"], "rb") as handle:
+            content_hash = hashlib.sha256(handle.read()).hexdigest()
+        async for chunk in file_reader.iter_path(f["path"], f["filename"], f["content_type"], content_hash):
+            buffer.append(chunk)
+            if len(buffer) >= flush_size:
+                chunks += vector_store.store_embeddings(buffer)["embedded_chunks"]
+                buffer = []
+    chunks += vector_store.store_embeddings(buffer)["embedded_chunks"]
+    return chunks
+
+
+def bench_ingestion(args, embedder, corpus: SyntheticCorpus, tmp: str):
+    report = {}
+    for kind in args.kinds:
+        files = corpus.write(os.path.join(tmp, f"corpus_{kind}"), args.documents, args.pages, kind)
+        file_reader = FileReader(chunker=Chunker(max_size=args.chunk_size, overlap=args.chunk_overlap))
+        vector_store = new_store(embedder, os.path.join(tmp, f"ingest_{kind}"))
+        try:
+            started = time.perf_counter()
+            chunks = asyncio.run(ingest(file_reader, vector_store, files))
+            elapsed = time.perf_counter() - started
+        finally:
+            file_reader.close()
+            vector_store.close()
+
+        pages = args.documents * args.pages
+        report[kind] = {
+            "files": len(files),
+            "pages": pages,
+            "chunks": chunks,
+            "bytes": sum(os.path.getsize(f["path"]) for f in files),
+            "seconds": elapsed,
+            "pages_per_second": pages / elapsed,
+            "chunks_per_second": chunks / elapsed,
+        }
+        print(f"ingestion {kind}: {pages / elapsed:.1f} pages/s, {chunks / elapsed:.1f} chunks/s", file=sys.stderr)
+    return report
+
+
+def populate(vector_store: VectorStore, corpus: SyntheticCorpus, size: int, texts_per_document: int = 20, batch: int = 10000):
+    """Fills the store with ``size`` short chunks, grouped into documents sharing topic words."""
+    documents = []
+    buffer = []
+    while vector_store.index.ntotal + len(buffer) < size:
+        if len(buffer) >= batch:
+            vector_store.store_embeddings(buffer)
+            buffer = []
+        document = {"topic": corpus.rng.sample(corpus.vocabulary, corpus.topic_words), "id": len(documents)}
+        documents.append(document)
+        count = min(texts_per_document, size - vector_store.index.ntotal - len(buffer))
+        for i in range(count):
+            buffer.append({
+                "text": f"{corpus.sentence(document['topic'])} {len(documents)}.{i}",
+                "metadata": {"filename": f"doc_{document['id']:07d}.txt", "file_id": str(document["id"]), "page_number": 1},
+            })
+    vector_store.store_embeddings(buffer)
+    return documents
+
+
+def bench_search(args, embedder, corpus: SyntheticCorpus, tmp: str):
+    report = {}
+    for size in args.sizes:
+        gc.collect()
+        rss_before = rss_bytes()
+        vector_store = new_store(embedder, os.path.join(tmp, f"search_{size}"), index_type="flat")
+        started = time.perf_counter()
+        documents = populate(vector_store, corpus, size)
+        populate_seconds = time.perf_counter() - started
+        queries = corpus.queries(documents, args.queries)
+        print(f"populated {size} vectors in {populate_seconds:.1f}s", file=sys.stderr)
+
+        metadata_path = vector_store.storage.metadata_path
+        entry = {
+            "vectors": vector_store.index.ntotal,
+            "populate_seconds": populate_seconds,
+            "metadata_bytes_on_disk": sum(
+                os.path.getsize(path) for path in (metadata_path, metadata_path + "-wal") if os.path.exists(path)
+            ),
+            "index_types": {},
+        }
+        try:
+            for index_type in args.index_types:
+                if size < MIN_TRAIN_VECTORS.get(index_type, 0):
+                    entry["index_types"][index_type] = {"skipped": f"needs at least {MIN_TRAIN_VECTORS[index_type]} vectors to train"}
+                    continue
+
+                started = time.perf_counter()
+                vector_store.migrate_index(index_type)
+                build_seconds = time.perf_counter() - started
+
+                modes = {}
+                for mode in args.modes:
+                    for query in queries[:args.warmup]:
+                        vector_store.search(query, args.k, mode=mode)
+                    latencies = []
+                    for query in queries:
+                        started = time.perf_counter()
+                        vector_store.search(query, args.k, mode=mode)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    modes[mode] = percentiles(latencies)
+
+                recall = vector_store.recall_report(queries[:args.recall_queries], k=args.k)
+                entry["index_types"][index_type] = {
+                    "build_seconds": build_seconds,
+                    "index_bytes": index_size(vector_store.index),
+                    "search": modes,
+                    "recall": recall,
+                }
+                print(f"{size} vectors, {index_type}: " + ", ".join(f"{m} p50 {r['p50_ms']:.2f}ms" for m, r in modes.items()), file=sys.stderr)
+            if args.quantizations:
+                entry["quantization"] = vector_store.quantization_report(
+                    queries[:args.recall_queries], k=args.k, quantizations=args.quantizations, rescore_factors=args.rescore_factors
+                )
+            entry["rss_bytes"] = rss_bytes()
+            entry["rss_growth_bytes"] = entry["rss_bytes"] - rss_before
+        finally:
+            vector_store.close()
+        report[str(size)] = entry
+        del vector_store
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Store sizes (vectors) for the search benchmark")
+    parser.add_argument("--index-types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--modes", nargs="+", default=["dense", "hybrid"], choices=SEARCH_MODES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--recall-queries", type=int, default=100)
+    parser.add_argument("--quantizations", nargs="*", default=list(QUANTIZATIONS), choices=QUANTIZATIONS, help="Quantizations to compare; pass the flag alone to skip the report")
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[4, 10], help="Candidates re-scored per result, for the quantization report")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=20, help="Files in the ingestion corpus")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per ingestion file")
+    parser.add_argument("--kinds", nargs="+", default=["pdf", "txt"], choices=["pdf", "txt"])
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size in characters")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--model", default="hashing", help='"hashing" for the offline stub, or a sentence-transformers model name')
+    parser.add_argument("--backend", default="sentence_transformers", choices=EMBEDDING_BACKENDS, help="Embedding backend running --model")
+    parser.add_argument("--embedding-threads", type=int, help="Inference threads of the embedding backend")
+    parser.add_argument("--quantize-embeddings", action="store_true", help="int8 weights (onnx backend)")
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--skip-search", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    embedder = build_embedder(args.model, args.backend, args.embedding_threads, args.quantize_embeddings)
+    corpus = SyntheticCorpus(seed=args.seed)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "faiss": faiss.__version__,
+            "numpy": np.__version__,
+        },
+        "config": vars(args),
+        "started_at": time.time(),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.skip_ingestion:
+            report["ingestion"] = bench_ingestion(args, embedder, corpus, tmp)
+        if not args.skip_search:
+            report["search"] = bench_search(args, embedder, corpus, tmp)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
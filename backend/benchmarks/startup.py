@@ -0,0 +1,67 @@
+"""
+Measures API startup: how long importing ``app`` takes (what every uvicorn
+worker and ``--reload`` pays before it can answer /ready), whether that import
+pulled in torch, and how long the embedding model then takes to load and to
+serve a first query. Each run is a fresh interpreter.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# Runs in a fresh interpreter and prints one JSON line
+PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+torch_at_import = "torch" in sys.modules
+model = app.vector_store.model
+getattr(model, "get", lambda: model)()
+loaded = time.perf_counter()
+app.vector_store.search("startup benchmark query", top_k=5)
+searched = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "torch_imported_by_app": torch_at_import,
+    "model_load_seconds": loaded - imported,
+    "first_search_seconds": searched - loaded,
+    "ready_to_serve_seconds": searched - started,
+}))
+"""
+
+
+def run_once(env):
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=backend, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--store-dir", help="Existing VECTOR_STORE_DIR to load (defaults to an empty store)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "VECTOR_STORE_DIR": args.store_dir or os.path.join(tmp, "store"), "UPLOAD_DIR": os.path.join(tmp, "uploads")}
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    report = {"runs": runs, "median": {}}
+    for key in ("import_seconds", "model_load_seconds", "first_search_seconds", "ready_to_serve_seconds"):
+        report["median"][key] = statistics.median(run[key] for run in runs)
+    report["torch_imported_by_app"] = any(run["torch_imported_by_app"] for run in runs)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
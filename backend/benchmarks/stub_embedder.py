@@ -0,0 +1,40 @@
+import re
+import zlib
+import numpy as np
+
+WORD = re.compile(r"\w+")
+
+
+class _WordTokenizer:
+    """Minimal stand-in for a Hugging Face tokenizer: one token per word."""
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[zlib.crc32(w.encode()) for w in WORD.findall(text)] for text in texts]}
+
+
+class HashingEmbedder:
+    """
+    Offline stand-in for a SentenceTransformer: feature-hashes words into a
+    normalised bag-of-words vector. Texts sharing words get similar vectors, so
+    retrieval quality and recall numbers stay meaningful without model weights.
+    """
+
+    def __init__(self, dimension: int = 384, max_seq_length: int = 256):
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.tokenizer = _WordTokenizer()
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(w.encode()) for w in WORD.findall(text.lower())), dtype=np.uint32)
+            if len(hashes):
+                signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+                np.add.at(embeddings[i], (hashes >> 1) % self.dimension, signs)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,381 @@
+import math
+import time
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Vectors needed before a trained index is worth building (faiss wants ~39 points per centroid)
+MIN_TRAIN_VECTORS = {"flat": 0, "hnsw": 0, "ivf_flat": 1000, "ivf_pq": 10000}
+
+# How flat, ivf_flat and hnsw indexes store vectors: float32 (none), float16, one byte per
+# dimension (int8, scaled per dimension) or one bit per dimension (binary, RaBitQ codes)
+QUANTIZATIONS = ("none", "fp16", "int8", "binary")
+
+# FAISS codec of each quantization; int8 learns per-dimension ranges and binary a centroid
+QUANTIZATION_CODECS = {"none": "Flat", "fp16": "SQfp16", "int8": "SQ8", "binary": "RaBitQ"}
+QUANTIZATION_MIN_TRAIN_VECTORS = {"none": 0, "fp16": 0, "int8": 1000, "binary": 1000}
+
+# l2: Euclidean distance on the raw embeddings (lower is closer); cosine: inner product
+# on L2-normalized embeddings (higher is closer), the similarity sentence-transformers
+# models are trained for
+METRICS = ("l2", "cosine")
+FAISS_METRICS = {"l2": faiss.METRIC_L2, "cosine": faiss.METRIC_INNER_PRODUCT}
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Number of IVF cells for a corpus of the given size."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def build_index(
+    index_type: str,
+    dimension: int,
+    n_vectors: int = 0,
+    nlist: Optional[int] = None,
+    pq_m: int = 48,
+    hnsw_m: int = 32,
+    quantization: str = "none",
+    metric: str = "l2",
+) -> faiss.Index:
+    """
+    Creates an empty (untrained) FAISS index of the given type.
+
+    Args:
+        index_type: One of INDEX_TYPES.
+        dimension: Embedding dimension.
+        n_vectors: Corpus size, used to pick nlist when it is not given.
+        nlist: Number of IVF cells.
+        pq_m: Number of PQ sub-quantizers (bytes per vector) for ivf_pq.
+        hnsw_m: Graph degree for hnsw.
+        quantization: One of QUANTIZATIONS, for flat, ivf_flat and hnsw indexes.
+        metric: One of METRICS; cosine indexes expect vectors from ``prepare_vectors``.
+    """
+    check_index_config(index_type, quantization, metric)
+    codec = QUANTIZATION_CODECS[quantization]
+    faiss_metric = FAISS_METRICS[metric]
+    if index_type == "flat":
+        return faiss.IndexFlat(dimension, faiss_metric) if quantization == "none" else faiss.index_factory(dimension, codec, faiss_metric)
+    if index_type == "hnsw":
+        return faiss.index_factory(dimension, f"HNSW{hnsw_m},{codec}", faiss_metric)
+
+    nlist = nlist or default_nlist(n_vectors)
+    if index_type == "ivf_flat":
+        return faiss.index_factory(dimension, f"IVF{nlist},{codec}", faiss_metric)
+    return faiss.index_factory(dimension, f"IVF{nlist},PQ{pq_m}", faiss_metric)
+
+
+def check_index_config(index_type: str, quantization: str = "none", metric: str = "l2"):
+    """Raises ValueError for an unknown index type, quantization or metric, or a combination FAISS cannot build."""
+    if metric not in METRICS:
+        raise ValueError(f"Unsupported metric: {metric}. Supported metrics are: {', '.join(METRICS)}")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}. Supported types are: {', '.join(INDEX_TYPES)}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization: {quantization}. Supported quantizations are: {', '.join(QUANTIZATIONS)}")
+    if index_type == "ivf_pq" and quantization != "none":
+        raise ValueError("ivf_pq already compresses vectors with product quantization; use quantization none")
+    if index_type != "flat" and quantization == "binary":
+        raise ValueError("Binary quantization is only supported by the flat index")
+
+
+def min_train_vectors(index_type: str, quantization: str = "none") -> int:
+    """Vectors needed before an index of this type and quantization is built."""
+    return max(MIN_TRAIN_VECTORS.get(index_type, 0), QUANTIZATION_MIN_TRAIN_VECTORS.get(quantization, 0))
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """Wraps an empty index so vectors are addressed by stable chunk ids instead of positions."""
+    return faiss.IndexIDMap2(index)
+
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """Returns the index underneath an id map."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Returns the chunk ids held by an id-mapped index, in insertion order."""
+    return faiss.vector_to_array(faiss.downcast_index(index).id_map).astype(np.int64)
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Maps a FAISS index instance back to its INDEX_TYPES name."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def quantization_of(index: faiss.Index) -> str:
+    """Maps a FAISS index instance back to its QUANTIZATIONS name (ivf_pq reports none)."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexRaBitQ, faiss.IndexIVFRaBitQ)):
+        return "binary"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "none"
+
+
+def metric_of(index: faiss.Index) -> str:
+    """Maps a FAISS index instance back to its METRICS name."""
+    return "cosine" if unwrap(index).metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def prepare_vectors(vectors: np.ndarray, metric: str) -> np.ndarray:
+    """Returns vectors (one per row) as contiguous float32, scaled to unit length for the cosine metric."""
+    if metric != "cosine":
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    vectors = np.array(vectors, dtype=np.float32)  # A copy, normalized in place
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def rank_order(scores: np.ndarray, metric: str) -> np.ndarray:
+    """Sorts each row of search scores best first: ascending distances, descending similarities."""
+    return np.argsort(-scores if metric == "cosine" else scores, axis=1, kind="stable")
+
+
+def is_compressed(index: faiss.Index) -> bool:
+    """True if the index holds lossy codes rather than the float32 vectors."""
+    return quantization_of(index) != "none" or index_type_of(index) == "ivf_pq"
+
+
+def populate_index(index: faiss.Index, vectors: np.ndarray, ids: Optional[np.ndarray] = None, batch_size: int = 65536):
+    """
+    Trains the index if needed and adds the vectors (under ``ids`` if given) in batches.
+
+    Vectors are normalized on the way in for cosine indexes.
+    """
+    metric = metric_of(index)
+    if not index.is_trained:
+        started = time.perf_counter()
+        index.train(prepare_vectors(vectors, metric))
+        logger.info(f"Trained {index_type_of(index)} index on {len(vectors)} vectors in {time.perf_counter() - started:.2f}s")
+
+    for start in range(0, len(vectors), batch_size):
+        batch = prepare_vectors(vectors[start:start + batch_size], metric)
+        if ids is None:
+            index.add(batch)
+        else:
+            index.add_with_ids(batch, np.ascontiguousarray(ids[start:start + batch_size], dtype=np.int64))
+
+
+def search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+    selectivity: float = 1.0,
+):
+    """
+    Builds per-query search parameters, so tuning one query does not mutate the shared index.
+
+    ``selector`` restricts the search to the chunk ids it accepts, the ``selectivity``
+    fraction of the index. IVF and HNSW only filter the candidates their probes visit,
+    so nprobe and efSearch are widened by the inverse of that fraction.
+    """
+    index_type = index_type_of(index)
+    extra = {"sel": selector} if selector is not None else {}
+    widen = 1 / max(selectivity, 1e-9)
+    if index_type in ("ivf_flat", "ivf_pq") and nprobe:
+        return faiss.SearchParametersIVF(nprobe=min(math.ceil(nprobe * widen), unwrap(index).nlist), **extra)
+    if index_type == "hnsw" and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=min(math.ceil(ef_search * widen), max(ef_search, index.ntotal)), **extra)
+    if extra:
+        return faiss.SearchParameters(**extra)
+    return None
+
+
+def recall_report(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    ids: Optional[np.ndarray] = None,
+    k: int = 10,
+    selector: Optional[faiss.IDSelector] = None,
+    nprobe_values: List[int] = (1, 4, 16, 64),
+    ef_search_values: List[int] = (16, 64, 256),
+) -> Dict[str, Any]:
+    """
+    Measures recall@k and latency of an index against an exact flat search.
+
+    Args:
+        index: The index under test.
+        vectors: The full-precision vectors held by the index.
+        queries: Query vectors, one per row (normalized here for cosine indexes).
+        ids: The id of each vector, for id-mapped indexes.
+        k: Number of neighbours compared.
+        selector: Restricts the index under test to the ids in ``ids``.
+        nprobe_values: nprobe settings to sweep for IVF indexes.
+        ef_search_values: efSearch settings to sweep for HNSW indexes.
+
+    Returns:
+        A dictionary with the exact-search latency and one entry per setting.
+    """
+    queries = prepare_vectors(queries, metric_of(index))
+    exact = build_index("flat", vectors.shape[1], metric=metric_of(index))
+    populate_index(exact, vectors)
+
+    started = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    if ids is not None:
+        truth = np.where(truth >= 0, ids[np.maximum(truth, 0)], -1)
+
+    index_type = index_type_of(index)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        settings = [{"nprobe": n} for n in nprobe_values]
+    elif index_type == "hnsw":
+        settings = [{"ef_search": ef} for ef in ef_search_values]
+    else:
+        settings = [{}]
+
+    rows = []
+    for setting in settings:
+        started = time.perf_counter()
+        _, found = index.search(queries, k, params=search_params(index, **setting, selector=selector))
+        latency_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+        rows.append({**setting, "recall_at_k": hits / (len(queries) * k), "latency_ms": latency_ms})
+
+    return {
+        "index_type": index_type,
+        "k": k,
+        "queries": len(queries),
+        "vectors": len(vectors),
+        "exact_latency_ms": exact_ms,
+        "results": rows,
+    }
+
+
+def exact_rerank(queries: np.ndarray, candidates: np.ndarray, vectors: np.ndarray, k: int, metric: str = "l2"):
+    """
+    Re-ranks candidates by their exact distance (or similarity) to the query.
+
+    Args:
+        queries: Query vectors, shape (n, d), normalized for the cosine metric.
+        candidates: Candidate ids of each query, shape (n, m), -1 where there is none.
+        vectors: Full-precision vector of each candidate, shape (n, m, d).
+        k: Candidates kept per query.
+        metric: One of METRICS.
+
+    Returns:
+        (scores, ids) of the k best candidates of each query, as from Index.search.
+    """
+    if metric == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=2, keepdims=True), 1e-12)
+        scores = np.einsum("nmd,nd->nm", vectors, queries).astype(np.float32)
+        scores[candidates < 0] = -np.inf
+    else:
+        scores = ((vectors - queries[:, None, :]) ** 2).sum(axis=2, dtype=np.float32)
+        scores[candidates < 0] = np.inf
+    order = rank_order(scores, metric)[:, :k]
+    scores = np.take_along_axis(scores, order, axis=1)
+    ids = np.where(np.isfinite(scores), np.take_along_axis(candidates, order, axis=1), -1)
+    return scores, ids
+
+
+def exact_search(queries: np.ndarray, ids: np.ndarray, vectors: np.ndarray, k: int, metric: str = "l2"):
+    """
+    Scores every query against every given vector and keeps the k best.
+
+    Args:
+        queries: Query vectors, shape (n, d), normalized for the cosine metric.
+        ids: Chunk id of each vector, shape (m,), -1 where there is none.
+        vectors: Full-precision vectors, shape (m, d).
+        k: Results kept per query.
+        metric: One of METRICS.
+
+    Returns:
+        (scores, ids) of the k best vectors of each query, as from Index.search.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if metric == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = queries @ vectors.T
+        scores[:, ids < 0] = -np.inf
+    else:
+        scores = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+        scores = np.maximum(scores, 0)
+        scores[:, ids < 0] = np.inf
+    order = rank_order(scores, metric)[:, :k]
+    scores = np.take_along_axis(scores, order, axis=1).astype(np.float32)
+    found = np.where(np.isfinite(scores), ids[order], -1)
+    return scores, found
+
+
+def quantization_report(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    quantizations: List[str] = QUANTIZATIONS,
+    rescore_factors: List[int] = (4,),
+    metric: str = "l2",
+) -> Dict[str, Any]:
+    """
+    Measures the memory saved and the recall@k lost by each quantization of a flat index.
+
+    Args:
+        vectors: The full-precision vectors to index.
+        queries: Query vectors, one per row.
+        k: Number of neighbours compared against an exact search.
+        quantizations: Quantizations to compare (see QUANTIZATIONS).
+        rescore_factors: Each also measures fetching ``factor * k`` candidates and
+            re-ranking them by their full-precision vectors (0 means no re-scoring).
+        metric: One of METRICS.
+
+    Returns:
+        A dictionary with one entry per quantization: index size, bytes per vector,
+        the fraction of memory saved over float32, and recall and latency per setting.
+    """
+    vectors = prepare_vectors(vectors, metric)
+    queries = prepare_vectors(queries, metric)
+    exact = build_index("flat", vectors.shape[1], metric=metric)
+    populate_index(exact, vectors)
+    _, truth = exact.search(queries, k)
+    baseline_bytes = len(faiss.serialize_index(exact))
+
+    rows = []
+    for quantization in quantizations:
+        index = build_index("flat", vectors.shape[1], quantization=quantization, metric=metric)
+        started = time.perf_counter()
+        populate_index(index, vectors)
+        build_seconds = time.perf_counter() - started
+        index_bytes = len(faiss.serialize_index(index))
+
+        results = []
+        for factor in (0, *rescore_factors):
+            started = time.perf_counter()
+            _, found = index.search(queries, k * max(factor, 1))
+            if factor > 1:
+                _, found = exact_rerank(queries, found, vectors[np.maximum(found, 0)], k, metric)
+            latency_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+            hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+            results.append({"rescore": factor, "recall_at_k": hits / (len(queries) * k), "latency_ms": latency_ms})
+
+        rows.append({
+            "quantization": quantization,
+            "index_bytes": index_bytes,
+            "bytes_per_vector": index_bytes / max(len(vectors), 1),
+            "memory_saved": 1 - index_bytes / baseline_bytes,
+            "build_seconds": build_seconds,
+            "results": results,
+        })
+
+    return {"k": k, "metric": metric, "queries": len(queries), "vectors": len(vectors), "quantizations": rows}
@@ -0,0 +1,135 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    An answer is reused when the chunks retrieved for a new query are exactly the
+    chunks it was generated from and the query embedding is within
+    ``similarity_threshold`` (cosine) of the cached query, so paraphrases hit
+    while a changed corpus (different chunks retrieved) misses. Entries expire
+    after ``ttl`` seconds, the least recently used are evicted beyond
+    ``max_entries``, and entries built from a document are dropped when that
+    document is deleted or uploaded again.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "saved_generation_ms": 0.0}
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_chunks: Dict[frozenset, List[int]] = {}  # retrieved chunk ids -> entry keys
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def get(self, query_embedding: np.ndarray, chunk_ids: Iterable[int]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached entry (answer, sources, ...) for the query, or None.
+
+        Args:
+            query_embedding: Embedding of the query.
+            chunk_ids: Ids of the chunks retrieved for the query, in any order.
+        """
+        query = self._normalize(query_embedding)
+        now = time.time()
+        with self._lock:
+            best, best_similarity = None, self.similarity_threshold
+            for key in list(self._by_chunks.get(frozenset(chunk_ids), ())):
+                entry = self._entries[key]
+                if now - entry["created_at"] > self.ttl:
+                    self._remove(key)
+                    continue
+                similarity = float(np.dot(query, entry["embedding"]))
+                if similarity >= best_similarity:
+                    best, best_similarity = key, similarity
+
+            if best is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            self.stats["hits"] += 1
+            self.stats["saved_generation_ms"] += entry["generation_ms"]
+            return {**entry["value"], "similarity": best_similarity}
+
+    def put(
+        self,
+        query_embedding: np.ndarray,
+        results: List[Dict[str, Any]],
+        value: Dict[str, Any],
+        generation_ms: float,
+    ):
+        """
+        Caches an answer.
+
+        Args:
+            query_embedding: Embedding of the query.
+            results: The chunks the answer was generated from (search results).
+            value: What ``get`` returns on a hit, such as the answer and sources.
+            generation_ms: Generation time a hit saves.
+        """
+        chunks = frozenset(result["chunk_id"] for result in results)
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {
+                "embedding": self._normalize(query_embedding),
+                "chunks": chunks,
+                "file_ids": {result.get("file_id") for result in results},
+                "filenames": {result.get("filename") for result in results},
+                "value": value,
+                "generation_ms": generation_ms,
+                "created_at": time.time(),
+            }
+            self._by_chunks.setdefault(chunks, []).append(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate(self, file_ids: Iterable[str] = (), filenames: Iterable[str] = ()) -> int:
+        """Drops entries generated from any of the given files. Returns the number dropped."""
+        file_ids, filenames = set(file_ids), set(filenames)
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["file_ids"] & file_ids or entry["filenames"] & filenames
+            ]
+            for key in stale:
+                self._remove(key)
+            self.stats["invalidations"] += len(stale)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers")
+        return len(stale)
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: int):
+        entry = self._entries.pop(key)
+        keys = self._by_chunks[entry["chunks"]]
+        keys.remove(key)
+        if not keys:
+            del self._by_chunks[entry["chunks"]]
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,297 @@
+import os
+import mmap
+import zlib
+import uuid
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NO_PAGE = -1
+NO_STRING = -1
+
+
+class ChunkTable:
+    """
+    Column-oriented in-memory table of chunk metadata.
+
+    Instead of one dict per chunk, every field is a typed array indexed by row:
+    chunk ids (ascending, so rows are found by binary search), interned
+    filename / file id / file hash indexes, page numbers and upload times,
+    16-byte uuids and 32-byte chunk hashes. Chunk texts are concatenated into
+    one UTF-8 blob addressed by an offset array, optionally zlib-compressed per
+    chunk and optionally kept in a file that is memory-mapped for reads, so
+    texts are only materialised for the rows actually returned.
+    """
+
+    def __init__(self, text_path: Optional[str] = None, compress: bool = False):
+        self.text_path = text_path
+        self.compress = compress
+
+        self._ids = array("q")
+        self._uuids = bytearray()        # 16 bytes per row
+        self._chunk_hashes = bytearray()  # 32 bytes per row, zeros when unknown
+        self._filenames = array("l")
+        self._file_ids = array("l")
+        self._file_hashes = array("l")
+        self._pages = array("l")
+        self._uploaded_at = array("d")
+        self._deleted = bytearray()       # one flag per row
+        self._offsets = array("q", [0])   # row i's text is blob[offsets[i]:offsets[i + 1]]
+
+        self._strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+        self._blob = bytearray()
+        self._file = None
+        self._map = None
+        if text_path:
+            self._file = open(text_path, "w+b")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return self._row(chunk_id) is not None
+
+    # -- writes ---------------------------------------------------------------
+
+    def extend(self, chunk_ids: Iterable[int], entries: List[Dict[str, Any]]):
+        """Appends rows; chunk ids must be larger than every id already stored."""
+        with self._lock:
+            for chunk_id, entry in zip(chunk_ids, entries):
+                chunk_id = int(chunk_id)
+                if self._ids and chunk_id <= self._ids[-1]:
+                    raise ValueError(f"Chunk ids must be appended in ascending order, got {chunk_id} after {self._ids[-1]}")
+
+                self._ids.append(chunk_id)
+                self._uuids += uuid.UUID(entry["id"]).bytes if entry.get("id") else bytes(16)
+                self._chunk_hashes += bytes.fromhex(entry["chunk_hash"]) if entry.get("chunk_hash") else bytes(32)
+                self._filenames.append(self._intern(entry.get("filename")))
+                self._file_ids.append(self._intern(entry.get("file_id")))
+                self._file_hashes.append(self._intern(entry.get("file_hash")))
+                page = entry.get("page_number")
+                self._pages.append(page if isinstance(page, int) else NO_PAGE)
+                self._uploaded_at.append(entry.get("uploaded_at") or 0.0)
+                self._deleted.append(0)
+                self._append_text(entry.get("text") or "")
+
+    def mark_deleted(self, chunk_ids: Iterable[int]):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                row = self._row(chunk_id)
+                if row is not None:
+                    self._deleted[row] = 1
+
+    def set_file_hash(self, file_id: str, file_hash: str):
+        with self._lock:
+            index = self._string_index.get(file_id)
+            if index is None:
+                return
+            value = self._intern(file_hash)
+            for row in np.flatnonzero(np.frombuffer(self._file_ids, dtype=self._file_ids.typecode) == index).tolist():
+                self._file_hashes[row] = value
+
+    def purge(self, chunk_ids: Iterable[int]):
+        """Removes rows for good, rewriting the columns and the text blob without them."""
+        with self._lock:
+            drop = np.isin(np.frombuffer(self._ids, dtype=np.int64), np.fromiter((int(i) for i in chunk_ids), dtype=np.int64))
+            if not drop.any():
+                return
+            keep = np.flatnonzero(~drop)
+
+            for name in ("_ids", "_filenames", "_file_ids", "_file_hashes", "_pages", "_uploaded_at"):
+                column = getattr(self, name)
+                kept = array(column.typecode)
+                kept.frombytes(np.frombuffer(column, dtype=column.typecode)[keep].tobytes())
+                setattr(self, name, kept)
+            self._uuids = bytearray(np.frombuffer(self._uuids, dtype=np.uint8).reshape(-1, 16)[keep].tobytes())
+            self._chunk_hashes = bytearray(np.frombuffer(self._chunk_hashes, dtype=np.uint8).reshape(-1, 32)[keep].tobytes())
+            self._deleted = bytearray(np.frombuffer(self._deleted, dtype=np.uint8)[keep].tobytes())
+            self._rewrite_texts(keep)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                os.remove(self.text_path)
+
+    # -- reads ----------------------------------------------------------------
+
+    def get(self, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """Returns the row as a dict (materialising its text), or None."""
+        with self._lock:
+            row = self._row(chunk_id)
+            if row is None:
+                return None
+            page = self._pages[row]
+            return {
+                "id": str(uuid.UUID(bytes=bytes(self._uuids[row * 16:row * 16 + 16]))),
+                "filename": self._string(self._filenames[row]),
+                "page_number": page if page != NO_PAGE else "N/A",
+                "text": self._text(row),
+                "file_id": self._string(self._file_ids[row]),
+                "chunk_hash": self._chunk_hash(row),
+                "file_hash": self._string(self._file_hashes[row]),
+                "uploaded_at": self._uploaded_at[row] or None,
+            }
+
+    def ids(self, include_deleted: bool = False) -> np.ndarray:
+        with self._lock:
+            ids = np.frombuffer(self._ids, dtype=np.int64).copy()
+            if include_deleted:
+                return ids
+            return ids[np.frombuffer(self._deleted, dtype=np.uint8) == 0]
+
+    def deleted_ids(self) -> np.ndarray:
+        with self._lock:
+            return np.frombuffer(self._ids, dtype=np.int64)[np.frombuffer(self._deleted, dtype=np.uint8) == 1].copy()
+
+    def scan(self, columns: Tuple[str, ...]) -> Iterator[tuple]:
+        """Yields (chunk_id, *columns) for every live row in id order."""
+        readers = {
+            "text": self._text,
+            "filename": lambda row: self._string(self._filenames[row]),
+            "file_id": lambda row: self._string(self._file_ids[row]),
+            "file_hash": lambda row: self._string(self._file_hashes[row]),
+            "chunk_hash": self._chunk_hash,
+            "page_number": lambda row: self._pages[row] if self._pages[row] != NO_PAGE else "N/A",
+            "uploaded_at": lambda row: self._uploaded_at[row] or None,
+        }
+        read = [readers[column] for column in columns]
+        row = 0
+        while True:
+            with self._lock:
+                if row >= len(self._ids):
+                    return
+                values = None if self._deleted[row] else (self._ids[row], *(r(row) for r in read))
+            if values is not None:
+                yield values
+            row += 1
+
+    def file_chunks(self, file_id: str) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        """Returns (chunk_id, chunk_hash, file_hash) for the live rows of one file."""
+        with self._lock:
+            index = self._string_index.get(file_id)
+            if index is None:
+                return []
+            rows = np.flatnonzero(
+                (np.frombuffer(self._file_ids, dtype=self._file_ids.typecode) == index)
+                & (np.frombuffer(self._deleted, dtype=np.uint8) == 0)
+            )
+            return [(self._ids[row], self._chunk_hash(row), self._string(self._file_hashes[row])) for row in rows.tolist()]
+
+    def files(self) -> List[Dict[str, Any]]:
+        """Returns one summary per live file: file_id, filename, upload time and chunk count."""
+        with self._lock:
+            live = np.frombuffer(self._deleted, dtype=np.uint8) == 0
+            file_ids = np.frombuffer(self._file_ids, dtype=self._file_ids.typecode)[live]
+            first_rows = np.flatnonzero(live)
+            indexes, first, counts = np.unique(file_ids, return_index=True, return_counts=True)
+            return [{
+                "file_id": self._string(int(index)),
+                "filename": self._string(self._filenames[int(first_rows[start])]),
+                "uploaded_at": self._uploaded_at[int(first_rows[start])] or None,
+                "chunks": int(count),
+            } for index, start, count in zip(indexes, first, counts)]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each part of the table."""
+        columns = sum(
+            len(column) * column.itemsize
+            for column in (self._ids, self._filenames, self._file_ids, self._file_hashes, self._pages, self._uploaded_at, self._offsets)
+        )
+        return {
+            "columns": columns + len(self._uuids) + len(self._chunk_hashes) + len(self._deleted),
+            "strings": sum(len(s) + 49 for s in self._strings),
+            "texts_in_memory": len(self._blob),
+            "texts_on_disk": self._offsets[-1] if self._file is not None else 0,
+        }
+
+    # -- internals ------------------------------------------------------------
+
+    def _row(self, chunk_id: int) -> Optional[int]:
+        chunk_id = int(chunk_id)
+        row = bisect_left(self._ids, chunk_id)
+        if row < len(self._ids) and self._ids[row] == chunk_id:
+            return row
+        return None
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self._strings)
+            self._strings.append(value)
+        return index
+
+    def _string(self, index: int) -> Optional[str]:
+        return self._strings[index] if index != NO_STRING else None
+
+    def _chunk_hash(self, row: int) -> Optional[str]:
+        digest = bytes(self._chunk_hashes[row * 32:row * 32 + 32])
+        return digest.hex() if any(digest) else None
+
+    def _append_text(self, text: str):
+        data = text.encode("utf-8")
+        if self.compress:
+            data = zlib.compress(data)
+        if self._file is not None:
+            self._file.seek(self._offsets[-1])
+            self._file.write(data)
+        else:
+            self._blob += data
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def _text(self, row: int) -> str:
+        start, stop = self._offsets[row], self._offsets[row + 1]
+        if self._file is not None:
+            if self._map is None or len(self._map) < stop:
+                # The file grew since it was mapped
+                self._file.flush()
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._map[start:stop]
+        else:
+            data = bytes(self._blob[start:stop])
+        if self.compress:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    def _rewrite_texts(self, keep: np.ndarray):
+        offsets = np.frombuffer(self._offsets, dtype=np.int64)
+        new_offsets = array("q", [0])
+
+        if self._file is None:
+            blob = bytearray()
+            for row in keep.tolist():
+                blob += self._blob[offsets[row]:offsets[row + 1]]
+                new_offsets.append(len(blob))
+            self._blob = blob
+        else:
+            self._file.flush()
+            tmp_path = self.text_path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                for row in keep.tolist():
+                    self._file.seek(offsets[row])
+                    out.write(self._file.read(offsets[row + 1] - offsets[row]))
+                    new_offsets.append(out.tell())
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            os.replace(tmp_path, self.text_path)
+            self._file = open(self.text_path, "r+b")
+
+        self._offsets = new_offsets
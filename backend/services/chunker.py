@@ -0,0 +1,108 @@
+import re
+import logging
+from collections import deque
+from typing import List, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends after ., ! or ? followed by whitespace, or at a blank line
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+WORD = re.compile(r"\S+\s*")
+
+
+def char_lengths(texts: List[str]) -> List[int]:
+    return [len(text) for text in texts]
+
+
+def token_lengths(tokenizer) -> Callable[[List[str]], List[int]]:
+    """
+    Returns a length function counting tokens with a Hugging Face tokenizer,
+    such as the ``tokenizer`` of a SentenceTransformer model.
+    """
+    def lengths(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+    return lengths
+
+
+class Chunker:
+    """
+    Splits text into chunks of at most ``max_size`` units on sentence boundaries.
+
+    Sizes are measured by ``length_function``, which takes a batch of texts and
+    returns their lengths: characters by default, or tokens of the embedding
+    model (see ``token_lengths``) so every chunk fits the encoder window.
+    Consecutive chunks share up to ``overlap`` units of trailing sentences.
+
+    Each sentence is measured once and enters and leaves the packing window once,
+    so splitting is linear in the length of the text. Sentences longer than
+    ``max_size`` are split on words, and words longer than that on characters.
+    """
+
+    def __init__(self, max_size: int = 1000, overlap: int = 200, length_function: Callable[[List[str]], List[int]] = char_lengths):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        if not 0 <= overlap < max_size:
+            raise ValueError("overlap must be at least 0 and smaller than max_size")
+        self.max_size = max_size
+        self.overlap = overlap
+        self.length_function = length_function
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, max_tokens: int, overlap: int = 32) -> "Chunker":
+        return cls(max_size=max_tokens, overlap=overlap, length_function=token_lengths(tokenizer))
+
+    def split(self, text: str) -> List[str]:
+        """Returns the chunks of ``text``, stripped and non-empty."""
+        pieces = self._pieces(text)
+
+        chunks = []
+        window = deque()
+        size = 0
+        for start, end, length in pieces:
+            if window and size + length > self.max_size:
+                chunks.append(text[window[0][0]:window[-1][1]].strip())
+                # Keep trailing pieces as overlap, as long as the next piece still fits
+                while window and (size > self.overlap or size + length > self.max_size):
+                    size -= window.popleft()[2]
+            window.append((start, end, length))
+            size += length
+
+        if window:
+            chunks.append(text[window[0][0]:window[-1][1]].strip())
+        return [chunk for chunk in chunks if chunk]
+
+    def _pieces(self, text: str) -> List[Tuple[int, int, int]]:
+        """Returns (start, end, length) spans of the sentences of ``text``, none longer than ``max_size``."""
+        spans = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(text):
+            spans.append((start, match.end()))
+            start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+
+        pieces = []
+        lengths = self.length_function([text[s:e] for s, e in spans])
+        for (s, e), length in zip(spans, lengths):
+            if length <= self.max_size:
+                pieces.append((s, e, length))
+            else:
+                pieces.extend(self._split_long(text, s, e))
+        return pieces
+
+    def _split_long(self, text: str, start: int, end: int) -> List[Tuple[int, int, int]]:
+        words = [(m.start(), m.end()) for m in WORD.finditer(text, start, end)]
+        pieces = []
+        lengths = self.length_function([text[s:e] for s, e in words])
+        for (s, e), length in zip(words, lengths):
+            if length <= self.max_size:
+                pieces.append((s, e, length))
+                continue
+            # A single unbroken run: slice by characters. A token spans at least one
+            # character, so a slice of max_size characters never exceeds max_size tokens.
+            for offset in range(s, e, self.max_size):
+                stop = min(offset + self.max_size, e)
+                pieces.append((offset, stop, self.length_function([text[offset:stop]])[0]))
+        return pieces
@@ -0,0 +1,88 @@
+import math
+import logging
+from typing import List, Dict, Any, Callable
+from services.chunker import SENTENCE_BOUNDARY
+from services.hashing import hash_text
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    """Rough LLM token counts (about four characters per token for English text)."""
+    return [math.ceil(len(text) / 4) for text in texts]
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context of at most ``max_tokens`` tokens.
+
+    Chunks are taken in ranking order. Sentences already included from a higher
+    ranked chunk (such as the overlap between neighbouring chunks) are dropped,
+    and the first chunk that does not fit is cut at a sentence boundary when at
+    least ``min_chunk_tokens`` of budget remain; everything after it is left out.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2048,
+        min_chunk_tokens: int = 64,
+        length_function: Callable[[List[str]], List[int]] = estimate_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.length_function = length_function
+
+    def build(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Args:
+            results: Search results, best first.
+
+        Returns:
+            A dictionary with the ``context`` text, the ``chunks`` it contains,
+            the ``tokens`` spent and how many chunks were deduplicated,
+            trimmed or dropped.
+        """
+        seen = set()
+        parts, used = [], []
+        tokens = 0
+        report = {"deduplicated_chunks": 0, "trimmed_chunks": 0, "dropped_chunks": 0}
+
+        for position, res in enumerate(results):
+            sentences = [s for s in self._sentences(res["text"]) if hash_text(s) not in seen]
+            if not sentences:
+                report["deduplicated_chunks"] += 1
+                continue
+
+            header = f"Source: {res['filename']} (Page {res['page_number']})\n"
+            lengths = self.length_function([header, *sentences])
+            cost = sum(lengths) + 1  # the newline between parts
+
+            if tokens + cost > self.max_tokens:
+                # Keep the leading sentences that fit, if that leaves a useful excerpt
+                budget = self.max_tokens - tokens - lengths[0] - 1
+                kept, spent = [], 0
+                for sentence, length in zip(sentences, lengths[1:]):
+                    if spent + length > budget:
+                        break
+                    kept.append(sentence)
+                    spent += length
+                if kept and spent >= self.min_chunk_tokens:
+                    parts.append(header + " ".join(kept))
+                    used.append(res)
+                    seen.update(hash_text(s) for s in kept)
+                    tokens += lengths[0] + spent + 1
+                    report["trimmed_chunks"] += 1
+                    position += 1
+                report["dropped_chunks"] = len(results) - position
+                break
+
+            parts.append(header + " ".join(sentences))
+            used.append(res)
+            seen.update(hash_text(s) for s in sentences)
+            tokens += cost
+
+        return {"context": "\n".join(parts), "chunks": used, "tokens": tokens, **report}
+
+    @staticmethod
+    def _sentences(text: str) -> List[str]:
+        return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
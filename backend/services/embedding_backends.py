@@ -0,0 +1,191 @@
+import os
+import json
+import logging
+from typing import List, Optional, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# sentence_transformers: the PyTorch model; onnx: the same model exported to ONNX, run
+# with ONNX Runtime on CPU (optionally with int8-quantized weights), without torch
+EMBEDDING_BACKENDS = ("sentence_transformers", "onnx")
+
+
+class EmbeddingBackend:
+    """
+    Turns texts into embeddings for the VectorStore.
+
+    Besides ``encode`` (the SentenceTransformer.encode API the store calls), a
+    backend exposes the ``tokenizer`` and ``max_seq_length`` of its model, which
+    the token-based chunker sizes chunks with.
+    """
+
+    name = ""
+    tokenizer = None
+    max_seq_length = 512
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Returns one float32 embedding per text (a single vector for a single string)."""
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The sentence-transformers (PyTorch) model; ``threads`` sets torch's intra-op threads for the process."""
+
+    name = "sentence_transformers"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, device: Optional[str] = None):
+        # Imported on first use, so importing the store does not pull in torch
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device=device)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, **kwargs)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Runs a sentence-transformers model exported to ONNX with ONNX Runtime on CPU.
+
+    ``model_name`` is a local model directory or a Hugging Face repo (names without
+    an organisation are looked up under sentence-transformers/, as SentenceTransformer
+    does). The directory must hold the tokenizer, the pooling configuration and
+    ``onnx_file``, as published for the sentence-transformers models. With
+    ``quantize`` the weights are dynamically quantized to int8 once and the
+    quantized file is kept next to the original.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, quantize: bool = False, onnx_file: str = "onnx/model.onnx"):
+        # Imported on first use; neither needs torch
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        directory = self._model_directory(model_name, onnx_file)
+        model_path = os.path.join(directory, onnx_file)
+        if quantize:
+            model_path = self._quantized(model_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        output_names = [o.name for o in self.session.get_outputs()]
+        self.output_name = next((name for name in ("token_embeddings", "last_hidden_state") if name in output_names), output_names[0])
+
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        config = self._read_json(directory, "sentence_bert_config.json")
+        self.max_seq_length = config.get("max_seq_length") or self.tokenizer.model_max_length
+        pooling = self._read_json(directory, "1_Pooling/config.json")
+        self.cls_pooling = bool(pooling.get("pooling_mode_cls_token"))
+        modules = self._read_json(directory, "modules.json") or []
+        self.normalize = any(module.get("type", "").endswith("Normalize") for module in modules)
+        logger.info(f"Loaded ONNX model {model_path} ({'cls' if self.cls_pooling else 'mean'} pooling, threads={threads or 'default'})")
+
+    @staticmethod
+    def _model_directory(model_name: str, onnx_file: str) -> str:
+        if os.path.isdir(model_name):
+            return model_name
+        from huggingface_hub import snapshot_download
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        return snapshot_download(repo_id, allow_patterns=[onnx_file, "*.json", "*.txt", "1_Pooling/*"])
+
+    @staticmethod
+    def _quantized(model_path: str) -> str:
+        quantized_path = model_path[:-len(".onnx")] + "_int8.onnx"
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized_path + ".tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+            logger.info(f"Quantized {model_path} to {quantized_path}")
+        return quantized_path
+
+    @staticmethod
+    def _read_json(directory: str, filename: str):
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        # Batch texts of similar length together, as SentenceTransformer does, to limit padding
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = None
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in positions], padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            if "token_type_ids" in self.input_names and "token_type_ids" not in feed:
+                feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+            hidden = self.session.run([self.output_name], feed)[0]
+
+            pooled = self._pool(hidden, encoded["attention_mask"])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[positions] = pooled
+
+        if embeddings is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if hidden.ndim == 2:  # The export already pools into sentence embeddings
+            pooled = hidden
+        elif self.cls_pooling:
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        pooled = pooled.astype(np.float32)
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+
+def load_embedding_backend(backend: str, model_name: str, threads: Optional[int] = None, quantize: bool = False) -> EmbeddingBackend:
+    """
+    Builds the embedding backend of the given name (see EMBEDDING_BACKENDS).
+
+    Args:
+        backend: "sentence_transformers" or "onnx".
+        model_name: sentence-transformers model name, Hugging Face repo or local directory.
+        threads: CPU threads used for inference (defaults to the runtime's choice).
+        quantize: Run int8-quantized weights (onnx only).
+    """
+    if backend == "sentence_transformers":
+        if quantize:
+            raise ValueError("int8 quantization is only supported by the onnx embedding backend")
+        return SentenceTransformerBackend(model_name, threads=threads)
+    if backend == "onnx":
+        return OnnxBackend(model_name, threads=threads, quantize=quantize)
+    raise ValueError(f"Unsupported embedding backend: {backend}. Supported backends are: {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def embedding_key(backend: str, model_name: str, quantize: bool = False) -> str:
+    """
+    Names the embeddings a backend produces, for the embedding cache.
+
+    Backends agree only within a tolerance, so each caches its own vectors; the
+    PyTorch backend keeps the bare model name used by existing caches.
+    """
+    if backend == "sentence_transformers":
+        return model_name
+    return f"{model_name}@{backend}{'-int8' if quantize else ''}"
@@ -0,0 +1,131 @@
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by model name + text hash.
+
+    The memory tier is an LRU capped at ``max_entries`` vectors. The optional disk
+    tier is a SQLite file capped at ``max_disk_entries`` rows, evicting the oldest
+    writes first; disk hits are promoted into memory.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        path: Optional[str] = None,
+        max_disk_entries: int = 1000000,
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_count = 0
+
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+            self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Returns the cached embedding for each text, or None where there is none.
+        """
+        keys = [self.key(text) for text in texts]
+        found = [None] * len(texts)
+        disk_lookups = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.stats["hits"] += 1
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+            if disk_lookups and self._conn:
+                wanted = list(disk_lookups)
+                for start in range(0, len(wanted), 500):
+                    batch = wanted[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in disk_lookups.pop(key):
+                            found[i] = vector
+                            self.stats["disk_hits"] += 1
+
+            self.stats["misses"] += sum(len(positions) for positions in disk_lookups.values())
+
+        return found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Stores freshly computed embeddings in both tiers.
+        """
+        keys = [self.key(text) for text in texts]
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+            if self._conn:
+                with self._conn:
+                    cursor = self._conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in zip(keys, vectors)],
+                    )
+                    self._disk_count += max(cursor.rowcount, 0)
+                    overflow = self._disk_count - self.max_disk_entries
+                    if overflow > 0:
+                        self._conn.execute(
+                            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                            (overflow,),
+                        )
+                        self._disk_count -= overflow
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": (self.stats["hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_count,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,109 @@
+import logging
+import threading
+from array import array
+from typing import List, Dict, Any, Iterable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FILTER_KEYS = ("file_ids", "filenames", "page_min", "page_max", "uploaded_after", "uploaded_before")
+
+
+class FileIndex:
+    """
+    In-memory index from files to their chunk ids, used to resolve search filters.
+
+    Each live file keeps its filename, upload time and compact arrays of chunk ids
+    and page numbers, so a filter is resolved to the matching chunk ids by looking
+    at the selected files only, without a metadata scan.
+    """
+
+    def __init__(self):
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._by_filename: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def add(self, chunk_ids: Iterable[int], entries: List[Dict[str, Any]]):
+        """Registers chunks; entries carry file_id, filename, page_number and uploaded_at."""
+        with self._lock:
+            for chunk_id, entry in zip(chunk_ids, entries):
+                file_id = entry.get("file_id")
+                record = self._files.get(file_id)
+                if record is None:
+                    record = self._files[file_id] = {
+                        "filename": entry.get("filename"),
+                        "uploaded_at": entry.get("uploaded_at"),
+                        "ids": array("q"),
+                        "pages": array("l"),
+                    }
+                    self._by_filename.setdefault(record["filename"], set()).add(file_id)
+                page = entry.get("page_number")
+                record["ids"].append(int(chunk_id))
+                record["pages"].append(page if isinstance(page, int) else -1)
+
+    def remove_file(self, file_id: str):
+        with self._lock:
+            record = self._files.pop(file_id, None)
+            if record is None:
+                return
+            file_ids = self._by_filename.get(record["filename"], set())
+            file_ids.discard(file_id)
+            if not file_ids:
+                self._by_filename.pop(record["filename"], None)
+
+    def select(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Returns the chunk ids matching every given filter, in ascending order.
+
+        Args:
+            filters: Any of ``file_ids`` and ``filenames`` (lists, matching any entry),
+                ``page_min`` and ``page_max`` (inclusive; chunks without a page never
+                match a page range) and ``uploaded_after`` / ``uploaded_before``
+                (Unix timestamps).
+        """
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unsupported filters: {', '.join(sorted(unknown))}. Supported filters are: {', '.join(FILTER_KEYS)}")
+
+        with self._lock:
+            file_ids = set(self._files)
+            if filters.get("file_ids") is not None:
+                file_ids &= set(filters["file_ids"])
+            if filters.get("filenames") is not None:
+                file_ids &= set().union(*(self._by_filename.get(name, set()) for name in filters["filenames"]))
+
+            after, before = filters.get("uploaded_after"), filters.get("uploaded_before")
+            page_min, page_max = filters.get("page_min"), filters.get("page_max")
+
+            selected = []
+            for file_id in file_ids:
+                record = self._files[file_id]
+                uploaded_at = record["uploaded_at"]
+                if after is not None and (uploaded_at is None or uploaded_at < after):
+                    continue
+                if before is not None and (uploaded_at is None or uploaded_at > before):
+                    continue
+
+                ids = np.frombuffer(record["ids"], dtype=np.int64)
+                if page_min is not None or page_max is not None:
+                    pages = np.frombuffer(record["pages"], dtype=np.dtype(record["pages"].typecode))
+                    mask = pages >= max(page_min or 1, 1)
+                    if page_max is not None:
+                        mask &= pages <= page_max
+                    ids = ids[mask]
+                selected.append(ids.copy())
+
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
+
+    def files(self) -> List[Dict[str, Any]]:
+        """Returns file_id, filename, upload time and chunk count of every file."""
+        with self._lock:
+            return [
+                {"file_id": file_id, "filename": record["filename"], "uploaded_at": record["uploaded_at"], "chunks": len(record["ids"])}
+                for file_id, record in self._files.items()
+            ]
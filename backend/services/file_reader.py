@@ -1,99 +1,270 @@
 import PyPDF2
+import asyncio
+import hashlib
 import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import time
 import uuid
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 import chardet
 from fastapi import UploadFile
-from io import BytesIO
+from services.chunker import Chunker
+from services.hashing import hash_text
+from services.metrics import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UPLOADED_BYTES = metrics.counter("uploaded_bytes_total", "Bytes of uploaded files written to disk")
+PARSED_PAGES = metrics.counter("parsed_pages_total", "PDF pages extracted")
+PARSED_CHUNKS = metrics.counter("parsed_chunks_total", "Chunks produced by the file reader, by file type", labels=("type",))
+
+# Names save_upload gives uploads: <uuid>_<filename>
+UPLOAD_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_")
+
+
+def _count_pdf_pages(path: str) -> int:
+    """Process-pool worker: returns the number of pages in a PDF."""
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Process-pool worker: returns (page_number, text) for pages ``start:stop`` of a PDF."""
+    reader = PyPDF2.PdfReader(path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
 class FileReader:
-    async def read_file(self, file: UploadFile) -> List[Dict[str, Any]]:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        pages_per_shard: int = 16,
+        max_inflight_shards: Optional[int] = None,
+        chunker: Optional[Chunker] = None,
+    ):
+        """
+        Args:
+            chunker: Splits extracted text into chunks; defaults to sentence-aligned
+                chunks of at most 1000 characters.
+            max_workers: Processes used for PDF page extraction (defaults to the CPU count).
+            pages_per_shard: Pages extracted per process-pool task.
+            max_inflight_shards: Shards parsed ahead of the consumer; bounds the extracted
+                text held in memory per upload to this many shards.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_shard = pages_per_shard
+        self.max_inflight_shards = max_inflight_shards or self.max_workers * 2
+        self.chunker = chunker or Chunker()
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: by now model-loading and refresh threads hold locks a fork would copy
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        """Shuts down the PDF extraction process pool."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def read_file(self, file: UploadFile, content_hash: str = None) -> List[Dict[str, Any]]:
         """
         Reads a file and returns chunks of text with associated metadata.
 
         Args:
             file: A FastAPI UploadFile object.
+            content_hash: The file's hash if the caller already computed it.
 
         Returns:
-            A list of dictionaries containing text chunks and metadata.
+            A list of dictionaries containing text chunks and metadata. Each chunk's
+            metadata carries the file's ``content_hash`` and its own ``chunk_hash``.
+        """
+        return [chunk async for chunk in self.iter_chunks(file, content_hash)]
+
+    async def iter_chunks(self, file: UploadFile, content_hash: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields chunks of an uploaded file as soon as they are extracted.
+
+        The upload is spooled to a temporary file in blocks rather than read into memory.
+        """
+        path, file_hash = await self.save_upload(file)
+        content_hash = content_hash or file_hash
+        try:
+            async for chunk in self.iter_path(path, file.filename, file.content_type, content_hash):
+                yield chunk
+        finally:
+            os.remove(path)
+
+    async def iter_path(self, path: str, filename: str, content_type: str, content_hash: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields chunks of a file on disk as soon as they are extracted.
         """
         file_id = str(uuid.uuid4())  # Generate a unique ID for each file
         metadata = {
             "file_id": file_id,
-            "filename": file.filename
+            "filename": filename,
+            "content_hash": content_hash,
+            "uploaded_at": time.time()
         }
-        text_chunks = []
 
         try:
-            # Reset file pointer to beginning
-            await file.seek(0)
-            
-            if file.content_type == "application/pdf":
-                await self._read_pdf(file, metadata, text_chunks)
-            elif file.content_type == "text/plain":
-                await self._read_text(file, metadata, text_chunks)
+            if content_type == "application/pdf":
+                chunks = self._iter_pdf(path, metadata)
+            elif content_type == "text/plain":
+                chunks = self._iter_text(path, metadata)
             else:
-                raise ValueError(f"Unsupported file type: {file.content_type}")
-                
-            # Reset file pointer again after reading
-            await file.seek(0)
-            
+                raise ValueError(f"Unsupported file type: {content_type}")
+
+            async for chunk in chunks:
+                chunk["metadata"]["chunk_hash"] = hash_text(chunk["text"])
+                yield chunk
+
         except Exception as e:
-            logger.error(f"Error reading file {file.filename}: {e}")
+            logger.error(f"Error reading file {filename}: {e}")
             raise
 
-        return text_chunks
+    async def save_upload(self, file: UploadFile, directory: Optional[str] = None, block_size: int = 1 << 20) -> Tuple[str, str]:
+        """
+        Copies an upload to disk in blocks, hashing it on the way.
+
+        Args:
+            file: A FastAPI UploadFile object.
+            directory: Where to save it as ``<uuid>_<filename>``; a temporary file if None.
+
+        Returns:
+            The saved path and the SHA-256 of the content.
+        """
+        digest = hashlib.sha256()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            target = open(os.path.join(directory, f"{uuid.uuid4()}_{os.path.basename(file.filename or 'upload')}"), "wb")
+        else:
+            target = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or "")[1])
+
+        await file.seek(0)
+        with target:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                digest.update(block)
+                target.write(block)
+                UPLOADED_BYTES.inc(len(block))
+        await file.seek(0)
+        return target.name, digest.hexdigest()
+
+    @staticmethod
+    def remove_uploads(directory: str) -> int:
+        """
+        Deletes the uploads ``save_upload`` left in a directory, returning how many.
+
+        Called at startup: ingestion jobs do not survive a restart, so any upload still
+        there belongs to a job that will never run.
+        """
+        if not os.path.isdir(directory):
+            return 0
+        stale = [name for name in os.listdir(directory) if UPLOAD_NAME.match(name)]
+        for name in stale:
+            os.remove(os.path.join(directory, name))
+        if stale:
+            logger.info(f"Removed {len(stale)} uploads left by unfinished ingestion jobs from {directory}")
+        return len(stale)
+
+    async def _iter_pdf(self, path: str, metadata: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Helper method to extract text from a PDF file.
+
+        Pages are extracted in shards on the process pool, so the event loop stays free
+        and large PDFs are parsed in parallel. Shards are yielded in page order with at
+        most ``max_inflight_shards`` parsed ahead of the consumer.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        pending = deque()
 
-    async def _read_pdf(self, file: UploadFile, metadata: Dict[str, Any], text_chunks: List[Dict[str, Any]]):
-        """Helper method to extract text from a PDF file."""
         try:
-            # Create a copy of the file content to avoid file handle issues
-            file_content = await file.read()
-            reader = PyPDF2.PdfReader(BytesIO(file_content))
-            
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:  # Skip empty pages
-                    text_chunks.append({
-                        "text": text.strip(),
-                        "metadata": {**metadata, "page_number": i + 1}
-                    })
-                else:
-                    logger.warning(f"Empty or non-extractable text on page {i + 1}")
-                    
+            page_count = await loop.run_in_executor(pool, _count_pdf_pages, path)
+            shards = deque(
+                (start, min(start + self.pages_per_shard, page_count))
+                for start in range(0, page_count, self.pages_per_shard)
+            )
+
+            while shards or pending:
+                while shards and len(pending) < self.max_inflight_shards:
+                    pending.append(loop.run_in_executor(pool, _extract_pdf_pages, path, *shards.popleft()))
+
+                # Time spent waiting for the extraction, not the extraction itself
+                with metrics.span("pdf_extract_wait"):
+                    pages = await pending.popleft()
+                PARSED_PAGES.inc(len(pages))
+                page_chunks = await asyncio.to_thread(self._split_pages, pages, metadata)
+                PARSED_CHUNKS.inc(len(page_chunks), type="pdf")
+                for chunk in page_chunks:
+                    yield chunk
+
         except Exception as e:
             logger.error(f"Error processing PDF file {metadata['filename']}: {e}")
             raise
+        finally:
+            for future in pending:
+                future.cancel()
 
-    async def _read_text(self, file: UploadFile, metadata: Dict[str, Any], text_chunks: List[Dict[str, Any]], chunk_size: int = 1000):
+    def _split_pages(self, pages: List[Tuple[int, str]], metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Splits extracted PDF pages into chunks; chunks never span pages."""
+        chunks = []
+        for page_number, text in pages:
+            with metrics.span("chunk"):
+                page_chunks = self.chunker.split(text)
+            if not page_chunks:  # Skip empty pages
+                logger.warning(f"Empty or non-extractable text on page {page_number}")
+            for i, chunk in enumerate(page_chunks):
+                chunks.append({
+                    "text": chunk,
+                    "metadata": {**metadata, "page_number": page_number, "chunk_number": i + 1}
+                })
+        return chunks
+
+    async def _iter_text(self, path: str, metadata: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        text_chunks = []
+        await asyncio.to_thread(self._read_text, path, metadata, text_chunks)
+        for chunk in text_chunks:
+            yield chunk
+
+    def _read_text(self, path: str, metadata: Dict[str, Any], text_chunks: List[Dict[str, Any]]):
         """Helper method to extract text from a plain text file and split into chunks."""
         try:
             # Read the file content
-            file_content = await file.read()
-            
+            with open(path, "rb") as f:
+                file_content = f.read()
+
             # Detect encoding
             encoding = chardet.detect(file_content)['encoding'] or 'utf-8'
             logger.info(f"Detected encoding for {metadata['filename']}: {encoding}")
-            
+
             # Decode and process text
             text = file_content.decode(encoding).strip()
-            
+
             if not text:
                 logger.warning(f"Empty text file: {metadata['filename']}")
                 return
 
-            # Split text into smaller chunks for better processing
-            for i in range(0, len(text), chunk_size):
-                chunk = text[i:i + chunk_size]
-                if chunk.strip():  # Only add non-empty chunks
-                    text_chunks.append({
-                        "text": chunk,
-                        "metadata": {**metadata, "chunk_number": i // chunk_size + 1}
-                    })
+            # Split text into sentence-aligned chunks that fit the embedding model
+            with metrics.span("chunk"):
+                chunks = self.chunker.split(text)
+            PARSED_CHUNKS.inc(len(chunks), type="text")
+            for i, chunk in enumerate(chunks):
+                text_chunks.append({
+                    "text": chunk,
+                    "metadata": {**metadata, "chunk_number": i + 1}
+                })
 
         except UnicodeDecodeError as e:
             logger.error(f"Encoding error in file {metadata['filename']}: {e}")
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def hash_text(text: str) -> str:
+    """Returns the content hash used to deduplicate chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
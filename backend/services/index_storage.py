@@ -0,0 +1,264 @@
+import os
+import json
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+
+class IndexStorage:
+    """
+    On-disk layout for a persistent VectorStore.
+
+    The directory holds these files:
+        index.faiss     - last checkpoint of the FAISS index, replaced atomically
+        vectors.log     - append-only log of (chunk id, float32 embedding) records, in id order
+        metadata.sqlite - chunk metadata sidecar (see MetadataStore)
+        manifest.json   - generation counters bumped by the writer on every change
+        writer.lock     - held by the one process allowed to write
+
+    Vectors added after the last checkpoint are replayed from the log on startup,
+    so the index file only needs to be rewritten occasionally. Compaction rewrites
+    the log without deleted chunks. Read-only processes watch the manifest to pick
+    up new checkpoints, vectors and deletions while the writer keeps running.
+    """
+
+    INDEX_FILE = "index.faiss"
+    LOG_FILE = "vectors.log"
+    LEGACY_VECTORS_FILE = "vectors.f32"
+    METADATA_FILE = "metadata.sqlite"
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = "writer.lock"
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.record = np.dtype([("id", "<i8"), ("vector", "<f4", (dimension,))])
+        os.makedirs(directory, exist_ok=True)
+
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+        self.metadata_path = os.path.join(directory, self.METADATA_FILE)
+        self.manifest_path = os.path.join(directory, self.MANIFEST_FILE)
+        self._lock_file = None
+
+        # In-memory copy of the log's id column, extended as the log grows
+        self._log_ids = np.empty(0, dtype=np.int64)
+        self._log_inode = None
+        self._log_ids_lock = threading.Lock()
+
+    def open_for_writing(self):
+        """
+        Takes the writer lock and repairs the files left by a crash.
+
+        Raises:
+            RuntimeError: If another process holds the writer lock.
+        """
+        try:
+            import fcntl
+        except ImportError:  # No advisory locks on this platform; a single writer is up to the deployment
+            fcntl = None
+        if fcntl is not None:
+            lock_file = open(os.path.join(self.directory, self.LOCK_FILE), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise RuntimeError(
+                    f"Another process is writing to {self.directory}; start additional workers as readers (VECTOR_STORE_ROLE=reader)"
+                )
+            self._lock_file = lock_file
+
+        self._upgrade_legacy_log()
+
+        # Drop a partially written trailing record left by a crash mid-append
+        if os.path.exists(self.log_path):
+            size = os.path.getsize(self.log_path)
+            if size % self.record.itemsize:
+                logger.warning(f"Truncating torn write at the end of {self.log_path}")
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(size // self.record.itemsize * self.record.itemsize)
+                    os.fsync(f.fileno())
+
+    def _upgrade_legacy_log(self):
+        """Converts a positional float32 vector log into id-tagged records (ids were row positions)."""
+        legacy_path = os.path.join(self.directory, self.LEGACY_VECTORS_FILE)
+        if not os.path.exists(legacy_path) or os.path.exists(self.log_path):
+            return
+
+        count = os.path.getsize(legacy_path) // (self.dimension * 4)
+        vectors = np.memmap(legacy_path, dtype=np.float32, mode="r", shape=(count, self.dimension)) if count else np.empty((0, self.dimension), dtype=np.float32)
+        self.rewrite_vectors(np.arange(count, dtype=np.int64), vectors)
+        os.remove(legacy_path)
+        logger.info(f"Upgraded {count} vectors from {legacy_path} to {self.log_path}")
+
+    def close(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the writer lock
+            self._lock_file = None
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_manifest(self, manifest: Dict[str, Any]):
+        """Atomically replaces the manifest; readers see either the old or the new one."""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_index(self, mmap: bool = False) -> Optional[faiss.Index]:
+        """
+        Reads the last index checkpoint, or returns None if there is none.
+
+        With ``mmap`` the index data is memory-mapped read-only instead of copied
+        into RAM; such an index cannot be appended to.
+        """
+        if not os.path.exists(self.index_path):
+            return None
+
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(self.index_path, flags)
+        logger.info(f"Loaded index checkpoint {self.index_path} with {index.ntotal} vectors")
+        return index
+
+    def save_index(self, index: faiss.Index):
+        """Writes an index checkpoint to a temporary file and atomically swaps it in."""
+        tmp_path = self.index_path + ".tmp"
+        faiss.write_index(index, tmp_path)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._fsync_directory()
+
+    def append_vectors(self, ids: np.ndarray, vectors: np.ndarray):
+        """Appends (id, vector) records to the log and flushes them to disk."""
+        with open(self.log_path, "ab") as f:
+            f.write(self._records(ids, vectors).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def vector_count(self) -> int:
+        if not os.path.exists(self.log_path):
+            return 0
+        return os.path.getsize(self.log_path) // self.record.itemsize
+
+    def load_vectors(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Returns a read-only memory map over records ``start:stop`` of the log.
+
+        Records have an ``id`` and a ``vector`` field.
+        """
+        count = self.vector_count()
+        stop = count if stop is None else min(stop, count)
+        if stop <= start:
+            return np.empty(0, dtype=self.record)
+
+        records = np.memmap(self.log_path, dtype=self.record, mode="r", shape=(count,))
+        return records[start:stop]
+
+    def log_ids(self) -> np.ndarray:
+        """
+        Returns the chunk ids of the log records, in log (= id) order.
+
+        The column is cached and only the records appended since the last call are
+        read; a log replaced by a compaction is read again.
+        """
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.int64)
+        count = stat.st_size // self.record.itemsize
+
+        with self._log_ids_lock:
+            cached = self._log_ids
+            if stat.st_ino != self._log_inode or count < len(cached) or (
+                len(cached) and self.load_vectors(len(cached) - 1, len(cached))["id"][0] != cached[-1]
+            ):
+                cached = np.empty(0, dtype=np.int64)
+            if count > len(cached):
+                cached = np.concatenate([cached, self.load_vectors(len(cached), count)["id"]])
+            self._log_ids, self._log_inode = cached, stat.st_ino
+            return cached
+
+    def read_vectors(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reads the logged vectors of the given chunk ids (any shape), touching only their records.
+
+        Returns:
+            (found, vectors): a mask of the ids present in the log, and a float32 array
+            with one more axis holding their vectors (undefined where not found).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        log_ids = self.log_ids()
+        records = self.load_vectors()
+        count = min(len(log_ids), len(records))
+        if not count:
+            return np.zeros(ids.shape, dtype=bool), np.zeros((*ids.shape, self.dimension), dtype=np.float32)
+
+        rows = records[np.searchsorted(log_ids[:count], ids).clip(0, count - 1)]
+        # Checked against the records themselves, in case a compaction swapped the log meanwhile
+        return rows["id"] == ids, rows["vector"]
+
+    def rewrite_vectors(self, ids: np.ndarray, vectors: np.ndarray, batch_size: int = 65536):
+        """Atomically replaces the log with the given records, written in batches."""
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(ids), batch_size):
+                f.write(self._records(ids[start:start + batch_size], vectors[start:start + batch_size]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._fsync_directory()
+
+    def begin_log_compaction(self, drop_ids: np.ndarray, batch_size: int = 65536):
+        """
+        Copies the current log minus ``drop_ids`` into a temporary file.
+
+        Runs without blocking appends; ``finish_log_compaction`` then copies the
+        records appended meanwhile and swaps the file in.
+
+        Returns:
+            The number of records processed so far.
+        """
+        count = self.vector_count()
+        with open(self.log_path + ".compact", "wb") as f:
+            self._copy_records(f, 0, count, drop_ids, batch_size)
+        return count
+
+    def finish_log_compaction(self, processed: int, drop_ids: np.ndarray, batch_size: int = 65536):
+        """Copies records appended since ``begin_log_compaction`` and atomically replaces the log."""
+        tmp_path = self.log_path + ".compact"
+        with open(tmp_path, "ab") as f:
+            self._copy_records(f, processed, self.vector_count(), drop_ids, batch_size)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._fsync_directory()
+
+    def _copy_records(self, f, start: int, stop: int, drop_ids: np.ndarray, batch_size: int):
+        for offset in range(start, stop, batch_size):
+            records = self.load_vectors(offset, min(offset + batch_size, stop))
+            f.write(records[~np.isin(records["id"], drop_ids)].tobytes())
+
+    def _records(self, ids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        records = np.empty(len(ids), dtype=self.record)
+        records["id"] = ids
+        records["vector"] = vectors
+        return records
+
+    def _fsync_directory(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INGESTED_FILES = metrics.counter("ingested_files_total", "Files processed by ingestion jobs, by final status", labels=("status",))
+
+
+class IngestionQueue:
+    """
+    In-process job queue that reads, chunks and embeds uploaded files in the background.
+
+    ``submit`` returns immediately with a job record; a pool of asyncio workers drains
+    the queue and updates per-file progress on the record as pages are parsed and
+    chunks embedded. When ``max_queue`` jobs are waiting, ``submit`` raises
+    asyncio.QueueFull so the caller can push back on the client.
+    """
+
+    def __init__(
+        self,
+        file_reader,
+        vector_store,
+        workers: int = 2,
+        max_queue: int = 16,
+        max_finished_jobs: int = 1000,
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Args:
+            on_complete: Called with the job record when a job completes.
+        """
+        self.file_reader = file_reader
+        self.vector_store = vector_store
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.flush_size = vector_store.batch_size * 4
+        self.on_complete = on_complete
+
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Cancels the workers, rolling back files they were ingesting, and removes the uploads of queued jobs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            _, files = self._queue.get_nowait()
+            self._remove_uploads(files)
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def submit(self, files: List[Dict[str, Any]], replaces: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Enqueues an ingestion job.
+
+        Args:
+            files: One dict per file with path, filename, content_type and content_hash.
+                The worker deletes each path once the file is processed.
+            replaces: Ids of stored files this upload supersedes. They are deleted once
+                every file of the job is ingested, and listed in ``replaced_file_ids``.
+
+        Returns:
+            The job record, also available from ``get_job``.
+        """
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "embedded_chunks": 0,
+            "duplicate_chunks": 0,
+            "replaces": list(replaces or []),
+            "replaced_file_ids": [],
+            "files": [{
+                "filename": f["filename"],
+                "status": "queued",
+                "file_id": None,
+                "pages_parsed": 0,
+                "chunks_parsed": 0,
+                "chunks_embedded": 0,
+                "message": None,
+            } for f in files],
+        }
+
+        self._queue.put_nowait((job, files))
+        self._jobs[job_id] = job
+        self._prune()
+        logger.info(f"Queued ingestion job {job_id} with {len(files)} files")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def get_stats(self):
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "running": statuses.count("running"),
+            "workers": self.workers,
+        }
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job, files = await self._queue.get()
+            try:
+                with metrics.span("ingest_job"):
+                    await self._run(job, files)
+                if self.on_complete:
+                    self.on_complete(job)
+            except Exception as e:
+                logger.error(f"Ingestion job {job['job_id']} failed: {e}\n{traceback.format_exc()}")
+                job["status"] = "failed"
+            finally:
+                job["finished_at"] = time.time()
+                self._remove_uploads(files)
+                self._queue.task_done()
+
+    @staticmethod
+    def _remove_uploads(files: List[Dict[str, Any]]):
+        for f in files:
+            if os.path.exists(f["path"]):
+                os.remove(f["path"])
+
+    async def _run(self, job: Dict[str, Any], files: List[Dict[str, Any]]):
+        job["status"] = "running"
+        job["started_at"] = time.time()
+
+        # Chunks are embedded in batches while later pages and files are still being parsed;
+        # one batch can span several files of the job
+        buffer = []
+        progress_by_id = {}
+        hashes = {}  # file_id -> content hash, registered once the whole file is stored
+        errors = {}  # file_id -> error message
+        storing = None
+
+        async def flush():
+            nonlocal storing
+            batch = [chunk for chunk in buffer if chunk["metadata"]["file_id"] not in errors]
+            buffer.clear()
+            if not batch:
+                return
+            try:
+                # Shielded, so a cancelled job can wait for the batch to land before rolling it back
+                storing = asyncio.ensure_future(asyncio.to_thread(self.vector_store.store_embeddings, batch))
+                store_result = await asyncio.shield(storing)
+                job["embedded_chunks"] += store_result["embedded_chunks"]
+                job["duplicate_chunks"] += store_result["duplicate_chunks"]
+                for chunk in batch:
+                    progress_by_id[chunk["metadata"]["file_id"]]["chunks_embedded"] += 1
+            except Exception as e:
+                logger.error(f"Error embedding uploaded files: {str(e)}\n{traceback.format_exc()}")
+                for chunk in batch:
+                    errors[chunk["metadata"]["file_id"]] = f"Failed to process file: {str(e)}"
+
+        try:
+            for f, progress in zip(files, job["files"]):
+                progress["status"] = "parsing"
+                pages = set()
+                try:
+                    async for chunk in self.file_reader.iter_path(f["path"], f["filename"], f["content_type"], f["content_hash"]):
+                        if progress["file_id"] is None:
+                            progress["file_id"] = chunk["metadata"]["file_id"]
+                            progress_by_id[progress["file_id"]] = progress
+                            hashes[progress["file_id"]] = f["content_hash"]
+                        if "page_number" in chunk["metadata"]:
+                            pages.add(chunk["metadata"]["page_number"])
+                            progress["pages_parsed"] = len(pages)
+                        progress["chunks_parsed"] += 1
+
+                        buffer.append(chunk)
+                        if len(buffer) >= self.flush_size:
+                            await flush()
+
+                    if progress["file_id"] is None:
+                        logger.warning(f"No text extracted from file: {f['filename']}")
+                        progress["status"] = "warning"
+                        progress["message"] = "No text could be extracted from the file"
+                    else:
+                        progress["status"] = "embedding"
+
+                except Exception as e:
+                    logger.error(f"Error processing file {f['filename']}: {str(e)}\n{traceback.format_exc()}")
+                    if progress["file_id"] is not None:
+                        errors[progress["file_id"]] = f"Failed to process file: {str(e)}"
+                    else:
+                        progress["status"] = "error"
+                        progress["message"] = f"Failed to process file: {str(e)}"
+
+            await flush()
+
+            for file_id, progress in progress_by_id.items():
+                if file_id in errors:
+                    # Roll back chunks of the failed file that were already embedded
+                    await asyncio.to_thread(self.vector_store.delete_file, file_id)
+                    progress["status"] = "error"
+                    progress["message"] = errors[file_id]
+                    progress["chunks_embedded"] = 0
+                else:
+                    await asyncio.to_thread(self.vector_store.complete_file, file_id, hashes[file_id])
+                    progress["status"] = "success"
+                    logger.info(f"File processed successfully: {progress['filename']}")
+
+            # Superseded files go only once their replacement is searchable in full
+            if job["replaces"] and all(progress["status"] == "success" for progress in job["files"]):
+                for file_id in job["replaces"]:
+                    result = await asyncio.to_thread(self.vector_store.delete_file, file_id)
+                    if result["deleted_chunks"]:
+                        job["replaced_file_ids"].append(file_id)
+                logger.info(f"Job {job['job_id']} replaced files {', '.join(job['replaced_file_ids']) or 'none'}")
+
+        except asyncio.CancelledError:
+            # Shutdown: roll back every file not yet completed, so it is neither half
+            # searchable nor rejected as a duplicate when uploaded again after a restart
+            if storing is not None:
+                await asyncio.wait([storing])
+            for file_id, progress in progress_by_id.items():
+                if progress["status"] != "success":
+                    self.vector_store.delete_file(file_id)
+                    progress["status"] = "error"
+                    progress["message"] = "Ingestion was interrupted by a shutdown"
+            job["status"] = "failed"
+            raise
+
+        for progress in job["files"]:
+            INGESTED_FILES.inc(status=progress["status"])
+        job["status"] = "completed"
@@ -0,0 +1,77 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """
+    Builds an expensive object (an embedding model, a cross-encoder, or anything
+    that needs one) on first use instead of at import time.
+
+    The first thread to call ``get`` (or to touch any attribute, which is
+    forwarded to the loaded object) runs ``loader`` while concurrent callers
+    wait for it, so the object is built exactly once. ``warm_up`` starts the
+    load in a background thread so it overlaps with the server coming up.
+    A failed load is reported by ``get_status`` and retried on the next use.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"  # not_loaded, loading, ready or failed
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    model = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger.error(f"Loading {self.name} failed: {e}")
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                metrics.record("model_load", self.load_seconds)
+                logger.info(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+                self._model = model
+                self.state = "ready"
+                self.error = None
+            return self._model
+
+    def warm_up(self) -> threading.Thread:
+        """Loads the model in a daemon thread; failures are logged and left for the next use."""
+        def load():
+            try:
+                self.get()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=load, name=f"warm-up {self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+    def __getattr__(self, attribute: str):
+        # Only called for attributes not set in __init__, i.e. those of the wrapped model
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+        return getattr(self.get(), attribute)
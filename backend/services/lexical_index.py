@@ -0,0 +1,140 @@
+import re
+import math
+import heapq
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Iterable, Tuple, Optional, Collection
+
+logger = logging.getLogger(__name__)
+
+# Words, keeping dotted and hyphenated identifiers (part numbers, parameter names) whole
+TOKEN = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased terms of ``text``. Compound identifiers such as ``AB-12.5`` are
+    indexed whole and as their parts, so both exact and partial queries match.
+    """
+    terms = []
+    for token in TOKEN.findall(text.lower()):
+        terms.append(token)
+        if "-" in token or "." in token:
+            terms.extend(part for part in re.split(r"[-.]", token) if part)
+    return terms
+
+
+def term_counts(texts: Iterable[str]) -> List[Counter]:
+    """Term frequencies of each text, as ``LexicalIndex.add_counts`` takes them."""
+    return [Counter(tokenize(text)) for text in texts]
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over chunk texts, keyed by the same chunk ids as
+    the FAISS index.
+
+    Postings are updated incrementally as chunks are added; deleted chunks are
+    excluded at query time and removed by ``remove`` when the index is compacted.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {chunk_id: term frequency}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, chunk_ids: Iterable[int], texts: Iterable[str]):
+        """Indexes the given chunks."""
+        self.add_counts(chunk_ids, term_counts(texts))
+
+    def add_counts(self, chunk_ids: Iterable[int], counts: Iterable[Counter]):
+        """Indexes chunks already tokenized by ``term_counts``, so callers can tokenize outside their own locks."""
+        with self._lock:
+            for chunk_id, frequencies in zip(chunk_ids, counts):
+                chunk_id = int(chunk_id)
+                for term, tf in frequencies.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                length = sum(frequencies.values())
+                self._lengths[chunk_id] = length
+                self._total_length += length
+
+    def remove(self, chunk_ids: Iterable[int]):
+        """Drops chunks from the index. Scans every posting list, so call it in bulk."""
+        chunk_ids = {int(i) for i in chunk_ids} & self._lengths.keys()
+        if not chunk_ids:
+            return
+        with self._lock:
+            for term in list(self._postings):
+                postings = self._postings[term]
+                for chunk_id in chunk_ids & postings.keys():
+                    del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+            for chunk_id in chunk_ids:
+                self._total_length -= self._lengths.pop(chunk_id)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        exclude: Optional[Collection[int]] = None,
+        include: Optional[Collection[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to ``top_k`` (chunk_id, BM25 score) pairs, best first.
+
+        Args:
+            query: Query text.
+            top_k: Number of results.
+            exclude: Chunk ids to leave out, such as tombstoned chunks.
+            include: If given, only these chunk ids are scored.
+        """
+        terms = set(tokenize(query))
+        scores: Dict[int, float] = {}
+        with self._lock:
+            n = len(self._lengths)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                if include is not None:
+                    # Walk whichever side is shorter
+                    if len(include) < len(postings):
+                        postings = {chunk_id: postings[chunk_id] for chunk_id in include if chunk_id in postings}
+                    else:
+                        postings = {chunk_id: tf for chunk_id, tf in postings.items() if chunk_id in include}
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if exclude:
+            scores = {chunk_id: score for chunk_id, score in scores.items() if chunk_id not in exclude}
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def get_stats(self):
+        return {"chunks": len(self._lengths), "terms": len(self._postings)}
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuses ranked lists of chunk ids with reciprocal rank fusion, best first.
+
+    Each list contributes ``1 / (k + rank)`` per id, so ids ranked well by
+    several retrievers rise to the top without calibrating their scores.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
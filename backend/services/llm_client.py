@@ -0,0 +1,106 @@
+import json
+import time
+import logging
+from typing import AsyncIterator, Optional
+import httpx
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens processed by the model server", labels=("kind",))
+
+
+def _count_tokens(data: dict):
+    """Counts the prompt and completion tokens Ollama reports in its final message."""
+    LLM_TOKENS.inc(data.get("prompt_eval_count") or 0, kind="prompt")
+    LLM_TOKENS.inc(data.get("eval_count") or 0, kind="completion")
+
+
+class LLMError(Exception):
+    """Raised when the model server reports an error."""
+
+
+class OllamaClient:
+    """
+    Async client for a long-lived local Ollama server.
+
+    A single pooled httpx.AsyncClient is shared by all requests, so generating an
+    answer never spawns a process or blocks the event loop. Point ``base_url`` at a
+    stub server to exercise the API without a model.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3",
+        timeout: float = 300.0,
+        max_connections: int = 16,
+    ):
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Generates a complete answer for the prompt.
+        """
+        response = await self._get_client().post(
+            "/api/generate",
+            json={"model": self.model, "prompt": prompt, "stream": False},
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data.get("error"):
+            raise LLMError(data["error"])
+        _count_tokens(data)
+        return data.get("response", "")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yields answer tokens as the model server produces them.
+        """
+        started = time.perf_counter()
+        first_token = True
+
+        async with self._get_client().stream(
+            "POST",
+            "/api/generate",
+            json={"model": self.model, "prompt": prompt, "stream": True},
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+
+                data = json.loads(line)
+                if data.get("error"):
+                    raise LLMError(data["error"])
+
+                token = data.get("response")
+                if token:
+                    if first_token:
+                        time_to_first_token = time.perf_counter() - started
+                        logger.info(f"Time to first token: {time_to_first_token:.3f}s")
+                        metrics.record("first_token", time_to_first_token)
+                        first_token = False
+                    yield token
+
+                if data.get("done"):
+                    _count_tokens(data)
+                    break
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
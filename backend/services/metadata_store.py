@@ -0,0 +1,217 @@
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Iterable
+import numpy as np
+from services.chunk_table import ChunkTable
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "filename", "page_number", "text", "file_id", "chunk_hash", "file_hash", "uploaded_at")
+COLUMN_TYPES = {"page_number": "", "uploaded_at": "REAL"}
+
+
+class MetadataStore:
+    """
+    Store of chunk metadata keyed by the stable chunk id used in the FAISS index.
+
+    Without a path the rows live in a compact in-memory ChunkTable (optionally
+    with compressed texts, or texts spilled to ``text_path``). With a path they
+    live in a SQLite sidecar and are read back one row at a time, so opening a
+    large corpus does not load every chunk text into memory.
+
+    Deleting a document only marks its rows as deleted (a tombstone); they are
+    removed for good by ``purge`` when the index is compacted.
+    """
+
+    def __init__(self, path: Optional[str] = None, text_path: Optional[str] = None, compress: bool = False):
+        self.path = path
+        if path and (text_path or compress):
+            logger.warning("Metadata text compression and spilling only apply to the in-memory store; ignored with a SQLite sidecar")
+        self._table = None if path else ChunkTable(text_path=text_path, compress=compress)
+        self._conn = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row_id INTEGER PRIMARY KEY, id TEXT NOT NULL, filename TEXT, page_number, text TEXT, "
+                "file_id TEXT, chunk_hash TEXT, file_hash TEXT, uploaded_at REAL, deleted INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Upgrade stores created before a column existed
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            for column in COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {COLUMN_TYPES.get(column, 'TEXT')}")
+            if "deleted" not in existing:
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_file_id ON chunks (file_id)")
+            self._conn.commit()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            logger.info(f"Opened metadata store {path} with {self._count} chunks")
+
+    def __len__(self) -> int:
+        """Number of rows, including deleted rows not yet purged."""
+        return self._count if self._conn else len(self._table)
+
+    def __contains__(self, chunk_id: int) -> bool:
+        if not self._conn:
+            return chunk_id in self._table
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE row_id = ?", (int(chunk_id),)).fetchone() is not None
+
+    def __getitem__(self, chunk_id: int) -> Dict[str, Any]:
+        chunk_id = int(chunk_id)
+        if not self._conn:
+            row = self._table.get(chunk_id)
+            if row is None:
+                raise IndexError(f"No metadata for chunk {chunk_id}")
+            return row
+
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM chunks WHERE row_id = ?", (chunk_id,)
+            ).fetchone()
+        if row is None:
+            raise IndexError(f"No metadata for chunk {chunk_id}")
+        return dict(zip(COLUMNS, row))
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterates over live chunk ids in ascending order."""
+        yield from self.ids().tolist()
+
+    def ids(self, include_deleted: bool = False) -> np.ndarray:
+        """Returns chunk ids in ascending order."""
+        if not self._conn:
+            return self._table.ids(include_deleted)
+
+        query = "SELECT row_id FROM chunks" + ("" if include_deleted else " WHERE deleted = 0") + " ORDER BY row_id"
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def deleted_ids(self) -> np.ndarray:
+        """Returns the ids of tombstoned rows."""
+        if not self._conn:
+            return self._table.deleted_ids()
+        with self._lock:
+            rows = self._conn.execute("SELECT row_id FROM chunks WHERE deleted = 1").fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def hashes(self) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+        """Yields (chunk_id, chunk_hash, file_hash) for every live row without loading chunk texts."""
+        if not self._conn:
+            yield from self._table.scan(("chunk_hash", "file_hash"))
+            return
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_id, chunk_hash, file_hash FROM chunks WHERE deleted = 0 ORDER BY row_id"
+            ).fetchall()
+        yield from rows
+
+    def texts(self, batch_size: int = 10000) -> Iterator[Tuple[int, str]]:
+        """Yields (chunk_id, text) for every live row, reading the sidecar in batches."""
+        yield from self.scan(("text",), batch_size)
+
+    def scan(self, columns: Tuple[str, ...], batch_size: int = 10000, after: int = -1) -> Iterator[tuple]:
+        """Yields (chunk_id, *columns) for every live row with an id above ``after``, in id order, reading the sidecar in batches."""
+        if not self._conn:
+            yield from (row for row in self._table.scan(columns) if row[0] > after)
+            return
+
+        last_id = after
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT row_id, {', '.join(columns)} FROM chunks WHERE deleted = 0 AND row_id > ? ORDER BY row_id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def file_chunks(self, file_id: str) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        """Returns (chunk_id, chunk_hash, file_hash) for the live rows of one file."""
+        if not self._conn:
+            return self._table.file_chunks(file_id)
+
+        with self._lock:
+            return self._conn.execute(
+                "SELECT row_id, chunk_hash, file_hash FROM chunks WHERE file_id = ? AND deleted = 0", (file_id,)
+            ).fetchall()
+
+    def files(self) -> List[Dict[str, Any]]:
+        """Returns one summary per live file: file_id, filename, upload time and chunk count."""
+        if not self._conn:
+            return self._table.files()
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, MIN(filename), MIN(uploaded_at), COUNT(*) FROM chunks WHERE deleted = 0 GROUP BY file_id"
+            ).fetchall()
+        return [{"file_id": row[0], "filename": row[1], "uploaded_at": row[2], "chunks": row[3]} for row in rows]
+
+    def extend(self, chunk_ids: Iterable[int], entries: List[Dict[str, Any]]):
+        """Inserts entries under the given chunk ids in a single transaction."""
+        chunk_ids = [int(i) for i in chunk_ids]
+        if not self._conn:
+            self._table.extend(chunk_ids, entries)
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO chunks (row_id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                [
+                    (chunk_id, *(e.get(column) for column in COLUMNS))
+                    for chunk_id, e in zip(chunk_ids, entries)
+                ],
+            )
+            self._count += len(entries)
+
+    def mark_deleted(self, chunk_ids: Iterable[int]):
+        """Tombstones rows; they stay readable until purged."""
+        chunk_ids = [int(i) for i in chunk_ids]
+        if not self._conn:
+            self._table.mark_deleted(chunk_ids)
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE row_id = ?", [(i,) for i in chunk_ids])
+
+    def set_file_hash(self, file_id: str, file_hash: str):
+        """Records the content hash of a file on all of its rows."""
+        if not self._conn:
+            self._table.set_file_hash(file_id, file_hash)
+            return
+
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE chunks SET file_hash = ? WHERE file_id = ?", (file_hash, file_id))
+
+    def purge(self, chunk_ids: Iterable[int]):
+        """Removes rows for good."""
+        chunk_ids = [int(i) for i in chunk_ids]
+        if not self._conn:
+            self._table.purge(chunk_ids)
+            return
+
+        with self._lock, self._conn:
+            cursor = self._conn.executemany("DELETE FROM chunks WHERE row_id = ?", [(i,) for i in chunk_ids])
+            self._count -= max(cursor.rowcount, 0)
+
+    def memory_usage(self) -> Optional[Dict[str, int]]:
+        """Approximate bytes held in memory by the in-memory table (None for the SQLite sidecar)."""
+        return self._table.memory_usage() if self._table else None
+
+    def close(self):
+        if self._table:
+            self._table.close()
+        if self._conn:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
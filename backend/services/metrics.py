@@ -0,0 +1,172 @@
+import time
+import bisect
+import threading
+import contextvars
+from typing import List, Dict, Tuple, Optional, Sequence
+
+# Latency buckets in seconds, from sub-millisecond FAISS searches to minute-long generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Spans of the request being served, for its Server-Timing header
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("trace", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    def __init__(self, registry: "Metrics", name: str, documentation: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    def __init__(self, registry: "Metrics", name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Span:
+    """Times a pipeline stage; the duration is readable as ``ms`` after the block."""
+
+    __slots__ = ("registry", "stage", "started", "seconds")
+
+    def __init__(self, registry: "Metrics", stage: str):
+        self.registry = registry
+        self.stage = stage
+        self.seconds = 0.0
+
+    @property
+    def ms(self) -> float:
+        return self.seconds * 1000
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.registry.record(self.stage, self.seconds)
+        return False
+
+
+class Metrics:
+    """
+    In-process metrics registry exported in the Prometheus text format.
+
+    Stages of the upload and answer pipelines are timed with ``span(stage)``,
+    which feeds one latency histogram labelled by stage and, while a request
+    trace is active, the Server-Timing header of that request. When disabled,
+    counters and histograms return immediately and spans only read the clock.
+    """
+
+    def __init__(self, namespace: str = "openbot", enabled: bool = False):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.stage_seconds = self.histogram("stage_seconds", "Duration of pipeline stages", labels=("stage",))
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, f"{self.namespace}_{name}", documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, f"{self.namespace}_{name}", documentation, labels, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            # Modules register their metrics at import time; re-registering returns the existing one
+            return self._metrics.setdefault(metric.name, metric)
+
+    def span(self, stage: str) -> Span:
+        return Span(self, stage)
+
+    def record(self, stage: str, seconds: float):
+        """Records a stage duration measured elsewhere."""
+        if not self.enabled:
+            return
+        self.stage_seconds.observe(seconds, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, seconds))
+
+    def start_trace(self) -> List[Tuple[str, float]]:
+        """Starts collecting the spans of the current request (and the tasks and threads it starts)."""
+        trace = []
+        _trace.set(trace)
+        return trace
+
+    @staticmethod
+    def server_timing(trace: List[Tuple[str, float]]) -> str:
+        """Formats spans as a Server-Timing header value; repeated stages are summed."""
+        totals: Dict[str, float] = {}
+        for stage, seconds in list(trace):
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+# Shared registry; app.py enables it and serves it on /metrics
+metrics = Metrics()
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single requests into batch calls.
+
+    ``submit`` waits up to ``max_wait_ms`` for other requests with the same key
+    (requests can only share a batch when they share its parameters) and then
+    runs ``batch_fn(key, items)`` once for all of them in a worker thread. A
+    batch is dispatched early once it holds ``max_batch_size`` items.
+    """
+
+    def __init__(self, batch_fn: Callable[[Hashable, List[Any]], List[Any]], max_batch_size: int = 32, max_wait_ms: float = 5):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.stats = {"requests": 0, "batches": 0}
+
+        self._pending: Dict[Hashable, List] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Adds ``item`` to the batch for ``key`` and returns its share of the batch result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future))
+        self.stats["requests"] += 1
+
+        if len(batch) >= self.max_batch_size:
+            self._dispatch(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_wait_ms / 1000, self._dispatch, key)
+        return await future
+
+    def get_stats(self):
+        batches = self.stats["batches"]
+        return {**self.stats, "avg_batch_size": self.stats["requests"] / batches if batches else 0.0}
+
+    def _dispatch(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            self.stats["batches"] += 1
+            asyncio.get_running_loop().create_task(self._run(key, batch))
+
+    async def _run(self, key: Hashable, batch: List):
+        try:
+            results = await asyncio.to_thread(self.batch_fn, key, [item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched call failed for {len(batch)} requests: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,75 @@
+import time
+import logging
+from typing import List, Dict, Any
+from services.lazy_model import LazyModel
+
+logger = logging.getLogger(__name__)
+
+
+def load_cross_encoder(model_name: str, max_length: int):
+    # Imported on first use, so importing the reranker does not pull in torch
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, max_length=max_length)
+
+
+class Reranker:
+    """
+    Second retrieval stage: scores (query, chunk) pairs with a small cross-encoder
+    and keeps the best few, so the prompt only carries the most relevant chunks.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32, max_length: int = 512):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = LazyModel(model_name, lambda: load_cross_encoder(model_name, max_length))
+
+        # Running counters, as for embedding throughput
+        self.stats = {"queries": 0, "pairs": 0, "seconds": 0.0}
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], top_n: int = 5) -> List[Dict[str, Any]]:
+        """
+        Reorders search results by cross-encoder relevance.
+
+        Args:
+            query: The user query.
+            results: Candidates from VectorStore.search.
+            top_n: Number of results to keep.
+
+        Returns:
+            The best ``top_n`` results, each with a ``rerank_score``.
+        """
+        return self.rerank_batch([query], [results], top_n)[0]
+
+    def rerank_batch(self, queries: List[str], results: List[List[Dict[str, Any]]], top_n: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Runs ``rerank`` for several queries, scoring all their pairs in the same batches.
+        """
+        pairs = [(query, result["text"]) for query, candidates in zip(queries, results) for result in candidates]
+        if not pairs:
+            return [[] for _ in queries]
+
+        started = time.perf_counter()
+        scores = self.model.predict(pairs, batch_size=self.batch_size)
+        elapsed = time.perf_counter() - started
+
+        self.stats["queries"] += len(queries)
+        self.stats["pairs"] += len(pairs)
+        self.stats["seconds"] += elapsed
+        logger.info(f"Reranked {len(pairs)} candidates for {len(queries)} queries in {elapsed * 1000:.1f}ms")
+
+        reranked = []
+        offset = 0
+        for candidates in results:
+            query_scores = scores[offset:offset + len(candidates)]
+            offset += len(candidates)
+            ranked = sorted(zip(query_scores, candidates), key=lambda item: item[0], reverse=True)[:top_n]
+            reranked.append([{**result, "rerank_score": float(score)} for score, result in ranked])
+        return reranked
+
+    def get_stats(self):
+        queries = self.stats["queries"]
+        return {
+            "model": self.model_name,
+            **self.stats,
+            "avg_ms_per_query": self.stats["seconds"] * 1000 / queries if queries else 0.0,
+        }
@@ -1,67 +1,1224 @@
 import uuid
+import time
+import bisect
+import logging
+import threading
+from typing import List, Dict, Optional, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
+from services.ann_index import (
+    QUANTIZATIONS, build_index, check_index_config, min_train_vectors, with_ids, unwrap, index_ids, index_type_of,
+    quantization_of, metric_of, is_compressed, prepare_vectors, rank_order, populate_index, search_params,
+    recall_report, exact_rerank, exact_search, quantization_report
+)
+from services.embedding_backends import EMBEDDING_BACKENDS, load_embedding_backend, embedding_key
+from services.embedding_cache import EmbeddingCache
+from services.file_index import FileIndex
+from services.hashing import hash_text
+from services.index_storage import IndexStorage
+from services.lazy_model import LazyModel
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion, term_counts
+from services.metadata_store import MetadataStore
+from services.metrics import metrics
+from services.rw_lock import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+EMBEDDED_TEXTS = metrics.counter("embedded_texts_total", "Texts run through the embedding model")
+EMBEDDING_CACHE_HITS = metrics.counter("embedding_cache_hits_total", "Texts whose embedding came from the cache")
+STORED_CHUNKS = metrics.counter("stored_chunks_total", "Chunks offered to the vector store, by outcome", labels=("outcome",))
+
+# dense: FAISS only; lexical: BM25 only; hybrid: both fused by reciprocal rank;
+# prefilter: FAISS restricted to the BM25 candidates
+SEARCH_MODES = ("dense", "lexical", "hybrid", "prefilter")
 
 class VectorStore:
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", embedding_dimension: int = 384):
-        # Initialize embedding model
-        self.model = SentenceTransformer(embedding_model)
+    def __init__(
+        self,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        embedding_dimension: int = 384,
+        embedding_backend: str = "sentence_transformers",
+        embedding_threads: Optional[int] = None,
+        embedding_quantize: bool = False,
+        batch_size: int = 64,
+        storage_dir: Optional[str] = None,
+        checkpoint_interval: int = 10000,
+        mmap_index: bool = False,
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        pq_m: int = 48,
+        hnsw_m: int = 32,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        filter_exact_limit: int = 5000,
+        quantization: str = "none",
+        rescore: int = 0,
+        metric: str = "l2",
+        min_similarity: Optional[float] = None,
+        adaptive_k_gap: Optional[float] = None,
+        cache_size: int = 10000,
+        cache_path: Optional[str] = None,
+        compaction_threshold: float = 0.2,
+        compress_metadata: bool = False,
+        metadata_text_path: Optional[str] = None,
+        search_mode: str = "dense",
+        lexical_candidates: int = 1000,
+        model=None,
+        read_only: bool = False,
+        refresh_interval: float = 1.0,
+        background_load: bool = False,
+    ):
+        # Embedding model, loaded on first use unless a pre-built encoder with the same encode() API is given.
+        # The backend (see EMBEDDING_BACKENDS) runs it with PyTorch or ONNX Runtime.
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {embedding_backend}. Supported backends are: {', '.join(EMBEDDING_BACKENDS)}")
+        if embedding_quantize and embedding_backend != "onnx":
+            raise ValueError("int8 quantization is only supported by the onnx embedding backend")
+        self.embedding_backend = embedding_backend
+        self.model = model if model is not None else LazyModel(
+            embedding_model,
+            lambda: load_embedding_backend(embedding_backend, embedding_model, threads=embedding_threads, quantize=embedding_quantize),
+        )
+
+        # Number of chunks encoded per forward pass during ingestion
+        self.batch_size = batch_size
+
+        # Running ingestion throughput counters
+        self.embedding_stats = {"batches": 0, "chunks": 0, "seconds": 0.0}
+
+        # Embeddings of previously seen texts, so repeated queries and chunks skip the encoder
+        cache_key = embedding_key(embedding_backend, embedding_model, embedding_quantize)
+        self.embedding_cache = EmbeddingCache(cache_key, max_entries=cache_size, path=cache_path) if cache_size or cache_path else None
+
+        # FAISS index with ID mapping (for retrieval). Vectors are addressed by stable
+        # int64 chunk ids, so deleting a document never shifts other ids. Trained index
+        # types start out flat and are migrated once enough vectors exist to train them.
+        # With a quantization the index holds compressed codes; ``rescore`` then re-ranks
+        # ``rescore * k`` candidates by the full-precision vectors kept in the vector log.
+        # The cosine metric stores normalized embeddings and ranks by inner product; an
+        # existing index built for another metric is rebuilt like any other migration.
+        check_index_config(index_type, quantization, metric)
+        self.dimension = embedding_dimension
+        self.index_type = index_type
+        self.index_params = {"nlist": nlist, "pq_m": pq_m, "hnsw_m": hnsw_m, "quantization": quantization, "metric": metric}
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rescore = rescore
+        # IVF and HNSW only filter the candidates they visit, so searches restricted to at most
+        # ``filter_exact_limit`` chunks score their logged vectors exactly instead
+        self.filter_exact_limit = filter_exact_limit
+        if min_train_vectors(index_type, quantization) == 0:
+            self.index = with_ids(build_index(index_type, embedding_dimension, quantization=quantization, metric=metric))
+        else:
+            self.index = with_ids(build_index("flat", embedding_dimension, metric=metric))
+
+        # Dense hits below ``min_similarity``, or after the first drop of ``adaptive_k_gap``
+        # in similarity between consecutive hits, are dropped instead of padding top_k
+        if (min_similarity is not None or adaptive_k_gap is not None) and metric != "cosine":
+            raise ValueError("min_similarity and adaptive_k_gap need the cosine metric")
+        self.min_similarity = min_similarity
+        self.adaptive_k_gap = adaptive_k_gap
+        self._next_id = 0
+
+        # Guards index mutation and swaps; vectors added during a rebuild are replayed onto the new index
+        self._lock = threading.RLock()
+        self._migrating = False
+        self._migration_backlog = None
+
+        # FAISS indexes can be searched concurrently, but not while vectors are added to them:
+        # searches hold the index lock shared and additions exclusively, outside ``_lock``
+        self._index_lock = ReadWriteLock()
+        # Checkpoints are written without ``_lock``; this keeps them in order
+        self._checkpoint_lock = threading.Lock()
+
+        # Ids of deleted chunks still present in the index, filtered out of searches until compaction
+        self.compaction_threshold = compaction_threshold
+        self._tombstones = set()
+        self._tombstone_selector = None
+
+        # Optional on-disk persistence (index checkpoint, vector log, metadata sidecar)
+        self.storage = IndexStorage(storage_dir, embedding_dimension) if storage_dir else None
+        self.checkpoint_interval = checkpoint_interval
+        self._unsaved_vectors = 0
+
+        # With ``mmap_index`` the checkpoint is memory-mapped at startup instead of read into
+        # RAM. A mapped index is read-only (mapped IVF lists cannot even be appended to or
+        # cloned), so a writer swaps in a loaded copy before its first upload
+        self.mmap_index = mmap_index
+        self._index_mapped = False
+
+        # One writer owns the storage directory and publishes every change in its manifest.
+        # Read-only stores load the writer's checkpoint (memory-mapped with ``mmap_index``, so
+        # its pages are shared by all readers), keep the vectors logged since then in a small "tail" index, and poll the
+        # manifest every ``refresh_interval`` seconds to pick up new chunks and deletions.
+        if read_only and not self.storage:
+            raise ValueError("A read-only vector store needs a storage_dir written by another process")
+        self.read_only = read_only
+        self.refresh_interval = refresh_interval
+        self._generation = 0
+        self._checkpoint_generation = 0
+        self._tail = None
+        self._tail_max_id = -1
+        self._metadata_max_id = -1
+        self._closed = threading.Event()
 
-        # FAISS index with ID mapping (for retrieval)
-        self.index = faiss.IndexFlatL2(embedding_dimension)  # L2 distance for similarity search
-        
         # Store embeddings with associated metadata
-        self.metadata_store = []  # List to track metadata corresponding to FAISS indices
+        # Keyed by FAISS chunk ids; without storage the chunk texts can be compressed or spilled to a file
+        self.metadata_store = MetadataStore(
+            self.storage.metadata_path if self.storage else None,
+            text_path=metadata_text_path,
+            compress=compress_metadata,
+        )
+
+        # Content hashes of stored chunks (-> newest live chunk id holding them) and of ingested
+        # files, for deduplication. Every file keeps its own rows; a chunk stored before reuses
+        # its logged vector instead of being embedded again.
+        self._chunk_rows = {}
+        self._file_hashes = set()
+
+        # BM25 index over chunk texts for exact-term matches. Rebuilding it from the metadata
+        # takes a while on a large corpus, so it is built in a background thread once the
+        # store has loaded; lexical searches wait for it, and changes made meanwhile are
+        # queued in ``_lexical_backlog`` and replayed onto it.
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {search_mode}. Supported modes are: {', '.join(SEARCH_MODES)}")
+        self.search_mode = search_mode
+        self.lexical_candidates = lexical_candidates
+        self.lexical_index = LexicalIndex()
+        self.lexical_state = "building"  # building, ready or failed
+        self._lexical_ready = threading.Event()
+        self._lexical_backlog = None
+
+        # Chunk ids per file, so filtered searches only consider the selected files
+        self.file_index = FileIndex()
+
+        # With ``background_load`` the index, hashes and file index are loaded in a thread,
+        # so the store can be constructed at import; ``state`` reports the load and every
+        # operation on the stored data waits for it
+        self.state = "loading"  # loading, ready or failed
+        self.load_error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._loaded = threading.Event()
+        if background_load:
+            threading.Thread(target=self._open_in_background, args=(mmap_index,), name="vector store load", daemon=True).start()
+        else:
+            self._open(mmap_index)
+
+    def _open_in_background(self, mmap_index: bool):
+        try:
+            self._open(mmap_index)
+        except Exception as e:
+            self.state = "failed"
+            self.load_error = str(e)
+            logger.error(f"Loading the vector store failed: {e}")
+            self._loaded.set()
+
+    def _open(self, mmap_index: bool):
+        started = time.perf_counter()
+        if self.read_only:
+            self.refresh()
+        elif self.storage:
+            self.storage.open_for_writing()
+            manifest = self.storage.read_manifest() or {}
+            self._generation = manifest.get("generation", 0)
+            self._checkpoint_generation = manifest.get("checkpoint", 0)
+            self._load(mmap_index)
+            self._load_hashes()
+            self._load_file_index()
+            self._publish()
+        self.load_seconds = time.perf_counter() - started
+
+        if self.storage:
+            self._start_lexical_build()
+        else:
+            self.lexical_state = "ready"
+            self._lexical_ready.set()
+        if self.read_only:
+            threading.Thread(target=self._refresh_loop, name="vector store refresh", daemon=True).start()
+
+        self.state = "ready"
+        self._loaded.set()
+        self._maybe_migrate()
+
+    def _wait_loaded(self):
+        """Blocks until the store has loaded (see ``background_load``)."""
+        self._loaded.wait()
+        if self.state == "failed":
+            raise RuntimeError(f"The vector store failed to load: {self.load_error}")
+
+    def _load_hashes(self):
+        for chunk_id, chunk_hash, file_hash in self.metadata_store.hashes():
+            if chunk_hash:
+                self._chunk_rows[chunk_hash] = chunk_id
+            if file_hash:
+                self._file_hashes.add(file_hash)
+
+    def _start_lexical_build(self):
+        with self._lock:
+            # Chunks up to here are read from the metadata; later changes go to the backlog
+            last_id = self._metadata_max_id if self.read_only else self._next_id - 1
+            self._lexical_backlog = []
+        threading.Thread(target=self._build_lexical, args=(last_id,), name="lexical index build", daemon=True).start()
+
+    def _build_lexical(self, last_id: int, batch_size: int = 10000):
+        started = time.perf_counter()
+        try:
+            lexical_index = LexicalIndex()
+            ids, texts = [], []
+            for chunk_id, text in self.metadata_store.texts():
+                if chunk_id > last_id:
+                    continue
+                ids.append(chunk_id)
+                texts.append(text or "")
+                if len(ids) == batch_size:
+                    lexical_index.add(ids, texts)
+                    ids, texts = [], []
+            lexical_index.add(ids, texts)
+
+            with self._lock:
+                for operation, args in self._lexical_backlog:
+                    getattr(lexical_index, operation)(*args)
+                self.lexical_index = lexical_index
+                self._lexical_backlog = None
+                self.lexical_state = "ready"
+            logger.info(f"Built lexical index over {len(lexical_index)} chunks in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self.lexical_state = "failed"
+            logger.error(f"Building the lexical index failed: {e}")
+        finally:
+            self._lexical_ready.set()
+
+    def _lexical_add(self, chunk_ids, counts):
+        # Takes ``term_counts`` of the texts, tokenized before the caller took ``_lock``
+        with self._lock:
+            if self._lexical_backlog is not None:
+                self._lexical_backlog.append(("add_counts", (list(chunk_ids), counts)))
+                return
+        # Once built, the lexical index is never swapped again
+        self.lexical_index.add_counts(chunk_ids, counts)
+
+    def _lexical_remove(self, chunk_ids):
+        with self._lock:
+            if self._lexical_backlog is not None:
+                self._lexical_backlog.append(("remove", (list(chunk_ids),)))
+                return
+        self.lexical_index.remove(chunk_ids)
+
+    def _load_file_index(self):
+        columns = ("file_id", "filename", "page_number", "uploaded_at")
+        ids, entries = [], []
+        for row in self.metadata_store.scan(columns):
+            ids.append(row[0])
+            entries.append(dict(zip(columns, row[1:])))
+        self.file_index.add(ids, entries)
+
+    def _load(self, mmap_index: bool):
+        """
+        Restores the index from the last checkpoint and replays newer vectors from the log.
+        """
+        records = self.storage.load_vectors()
+        log_ids = self.storage.log_ids()
+        meta_ids = self.metadata_store.ids(include_deleted=True)
+
+        # Vectors are logged before their metadata is committed, so metadata without a
+        # logged vector can only come from an interrupted compaction; drop it. Logged
+        # vectors without metadata (an interrupted upload) are skipped below.
+        orphans = np.setdiff1d(meta_ids, log_ids)
+        if len(orphans):
+            self.metadata_store.purge(orphans)
+            meta_ids = np.setdiff1d(meta_ids, orphans)
+
+        index = self.storage.load_index(mmap=mmap_index)
+        if index is not None and not isinstance(faiss.downcast_index(index), faiss.IndexIDMap):
+            logger.info("Discarding positional index checkpoint, rebuilding it from the vector log")
+            index = None
+        if index is not None:
+            self.index = index
+            self._index_mapped = mmap_index
+
+        held = index_ids(self.index)
+        replay = (log_ids > (held.max() if len(held) else -1)) & np.isin(log_ids, meta_ids)
+        if replay.any():
+            if mmap_index and index is not None:
+                # A memory-mapped index is read-only, so load a copy the log can be replayed into
+                self.index = self.storage.load_index()
+                self._index_mapped = False
+            logger.info(f"Replaying {int(replay.sum())} vectors from the log")
+            populate_index(self.index, records["vector"][replay], log_ids[replay])
+            self._unsaved_vectors = int(replay.sum())
+
+        # Deleted rows, plus checkpointed ids whose metadata was purged after the checkpoint
+        self._tombstones = set(self.metadata_store.deleted_ids().tolist()) | set(np.setdiff1d(held, meta_ids).tolist())
+        self._next_id = int(max(log_ids.max(initial=-1), meta_ids.max(initial=-1))) + 1
+
+        logger.info(f"Vector store ready with {self.index.ntotal} vectors ({len(self._tombstones)} deleted)")
+
+    def checkpoint(self):
+        """
+        Atomically writes the current index to disk.
+
+        The index is copied in memory while additions wait, then the copy is written and
+        synced without the lock, so searches and uploads carry on. Call it without holding the lock.
+        """
+        if not self.storage:
+            return
+        self._require_writer()
+        with self._checkpoint_lock:
+            with self._index_lock.read():
+                index = faiss.clone_index(self.index)
+                self._unsaved_vectors = 0
+            self.storage.save_index(index)
+            with self._lock:
+                self._publish(checkpoint=True)
+        logger.info(f"Checkpointed index with {index.ntotal} vectors")
+
+    def close(self):
+        """
+        Checkpoints any unsaved vectors and releases the metadata store.
+        """
+        self._loaded.wait()
+        self._closed.set()
+        if self.storage and self._unsaved_vectors:
+            self.checkpoint()
+        with self._lock:
+            self.metadata_store.close()
+            if self.embedding_cache:
+                self.embedding_cache.close()
+            if self.storage:
+                self.storage.close()
+
+    def _require_writer(self):
+        if self.read_only:
+            raise RuntimeError("This vector store is read-only; writes go through the writer process")
+
+    def _publish(self, checkpoint: bool = False):
+        """Bumps the manifest generation so readers pick up the latest change (call with the lock held)."""
+        if not self.storage:
+            return
+        self._generation += 1
+        if checkpoint:
+            self._checkpoint_generation = self._generation
+        self.storage.write_manifest({
+            "generation": self._generation,
+            "checkpoint": self._checkpoint_generation,
+            "index_type": index_type_of(self.index),
+            "quantization": quantization_of(self.index),
+            "metric": metric_of(self.index),
+            "updated_at": time.time(),
+        })
+
+    def refresh(self) -> bool:
+        """
+        Applies the changes the writer published since the last refresh (read-only stores).
+
+        A new checkpoint is memory-mapped and replaces the index and its tail. Chunks
+        whose metadata was committed since are added to the tail index and to the
+        lexical and file indexes, and newly deleted chunks are tombstoned.
+
+        Returns:
+            True if the manifest had changed.
+        """
+        manifest = self.storage.read_manifest() or {"generation": 0, "checkpoint": 0}
+        if self._tail is not None and manifest["generation"] == self._generation:
+            return False
+
+        with metrics.span("refresh"):
+            new_checkpoint = self._tail is None or manifest["checkpoint"] != self._checkpoint_generation
+            index, tail = self.index, self._tail
+            if new_checkpoint:
+                index = self.storage.load_index(mmap=self.mmap_index) or self.index
+                tail = with_ids(build_index("flat", self.dimension, metric=metric_of(index)))
+                tail_max_id = int(index_ids(index).max(initial=-1))
+            else:
+                tail_max_id = self._tail_max_id
+
+            # Metadata is committed after the vectors are logged, so every new row has its vector.
+            # The first refresh leaves the texts to the background lexical index build.
+            first = self._tail is None
+            columns = ("file_id", "filename", "page_number", "uploaded_at")
+            ids, texts, entries = [], [], []
+            for row in self.metadata_store.scan(columns if first else ("text", *columns), after=self._metadata_max_id):
+                ids.append(row[0])
+                if not first:
+                    texts.append(row[1])
+                entries.append(dict(zip(columns, row[-len(columns):])))
+            metadata_max_id = max(ids[-1] if ids else -1, self._metadata_max_id)
+
+            records = self.storage.load_vectors()
+            start = bisect.bisect_right(records, tail_max_id, key=lambda record: record["id"])
+            stop = bisect.bisect_right(records, metadata_max_id, key=lambda record: record["id"])
+            deleted = set(self.metadata_store.deleted_ids().tolist())
+            counts = term_counts(texts)
+
+            # Chunks deleted and purged by a compaction between two refreshes were never seen as deleted
+            vanished, stale_files = np.empty(0, dtype=np.int64), set()
+            if new_checkpoint and self._tail is not None:
+                vanished = np.setdiff1d(self.file_index.select({}), self.metadata_store.ids(include_deleted=True))
+                if len(vanished):
+                    live_files = {f["file_id"] for f in self.metadata_store.files()}
+                    stale_files = {f["file_id"] for f in self.file_index.files()} - live_files
+
+            with self._lock:
+                if stop > start:
+                    with self._index_lock.write():
+                        tail.add_with_ids(prepare_vectors(records["vector"][start:stop], metric_of(tail)), np.asarray(records["id"][start:stop]))
+                    tail_max_id = int(records["id"][stop - 1])
+                if not first:
+                    self._lexical_add(ids, counts)
+                self.file_index.add(ids, entries)
+
+                # Rows purged by a compaction are only gone from the index once its checkpoint is loaded
+                newly_deleted = deleted - self._tombstones
+                purged = self._tombstones - deleted if new_checkpoint else set()
+                for file_id in self._file_ids(newly_deleted) | stale_files:
+                    self.file_index.remove_file(file_id)
+                self._lexical_remove(np.union1d(np.fromiter(purged, dtype=np.int64), vanished))
+
+                self.index, self._tail, self._tail_max_id = index, tail, tail_max_id
+                self._tombstones = deleted if new_checkpoint else self._tombstones | deleted
+                self._tombstone_selector = None
+                self._metadata_max_id = metadata_max_id
+                self._generation = manifest["generation"]
+                self._checkpoint_generation = manifest["checkpoint"]
+                self._next_id = max(self._next_id, tail_max_id + 1)
+
+        logger.info(
+            f"Refreshed to generation {self._generation}: {self.index.ntotal} checkpointed and "
+            f"{self._tail.ntotal} newer vectors, {len(self._tombstones)} deleted"
+        )
+        return True
+
+    def _file_ids(self, chunk_ids) -> set:
+        file_ids = set()
+        for chunk_id in chunk_ids:
+            try:
+                file_ids.add(self.metadata_store[chunk_id]["file_id"])
+            except IndexError:  # Purged meanwhile
+                pass
+        return file_ids
+
+    def _refresh_loop(self):
+        while not self._closed.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Refreshing the read-only vector store failed: {e}")
+
+    def _live_snapshot(self):
+        """
+        Returns the ids held by the index, the ids of deleted chunks and how many vector
+        log records hold them: cheap copies to take with the lock held, for ``_live_vectors``.
+        """
+        if not self.storage and (index_type_of(self.index), quantization_of(self.index)) != ("flat", "none"):
+            raise ValueError("Rebuilding a non-flat index requires a storage_dir holding the full-precision vectors")
+        held = index_ids(self.index)
+        if self._tail is not None:
+            held = np.concatenate([held, index_ids(self._tail)])
+        deleted = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+        return held, deleted, self.storage.vector_count() if self.storage else 0
+
+    def _live_vectors(self, held: np.ndarray, deleted: np.ndarray, logged: int):
+        """
+        Returns (ids, vectors) for the chunks of a ``_live_snapshot`` that are not deleted,
+        reading them without the lock.
+        """
+        live = np.setdiff1d(held, deleted)
+        if self.storage:
+            records = self.storage.load_vectors(0, logged)
+            mask = np.isin(records["id"], live)
+            if mask.all():
+                return np.asarray(records["id"]), records["vector"]
+            return np.asarray(records["id"][mask]), records["vector"][mask]
+
+        with self._index_lock.read():
+            index = self.index
+            ids = index_ids(index)
+            vectors = unwrap(index).reconstruct_n(0, index.ntotal)
+        mask = np.isin(ids, live)
+        return ids[mask], vectors[mask]
+
+    def _tombstone_filter(self):
+        """
+        Returns a FAISS selector excluding deleted chunks, or None if nothing is deleted.
+        """
+        if not self._tombstones:
+            return None
+        if self._tombstone_selector is None:
+            ids = np.array(sorted(self._tombstones), dtype=np.int64)
+            batch = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+            # The wrapped selector lives as long as the one handed to FAISS, which searches
+            # may still hold after the filter is rebuilt
+            self._tombstone_selector = faiss.IDSelectorNot(batch)
+            self._tombstone_selector.referenced_objects = [batch]
+        return self._tombstone_selector
+
+    def _maybe_migrate(self):
+        """
+        Starts a background migration once the configured index type can be trained.
+        """
+        with self._lock:
+            target = (self.index_type, self.index_params["quantization"], self.index_params["metric"])
+            if self.read_only or self._migrating or (index_type_of(self.index), quantization_of(self.index), metric_of(self.index)) == target:
+                return
+            if self.index.ntotal >= min_train_vectors(self.index_type, self.index_params["quantization"]):
+                self.migrate_index(self.index_type, background=True)
+
+    def _maybe_compact(self):
+        """
+        Starts a background compaction once deleted chunks make up enough of the index.
+        """
+        with self._lock:
+            if self.read_only or self._migrating or not self._tombstones:
+                return
+            if len(self._tombstones) >= self.compaction_threshold * max(self.index.ntotal, 1):
+                self.compact(background=True)
+
+    def compact(self, background: bool = False):
+        """
+        Rebuilds the index without deleted chunks and drops them from disk.
+        """
+        self.migrate_index(self.index_type, background=background)
+
+    def migrate_index(self, index_type: str, background: bool = False, **params):
+        """
+        Rebuilds the index as ``index_type`` from the stored vectors and swaps it in.
+
+        Training and population happen outside the lock, so searches and uploads keep
+        using the old index until the swap; vectors added meanwhile are replayed.
+        Deleted chunks are left out, so every rebuild also compacts the index.
+
+        Args:
+            index_type: One of "flat", "ivf_flat", "hnsw" or "ivf_pq".
+            background: Run the migration in a daemon thread and return immediately.
+            params: Overrides for nlist, pq_m, hnsw_m, quantization and metric.
+        """
+        self._wait_loaded()
+        self._require_writer()
+        config = {**self.index_params, **params}
+        check_index_config(index_type, config["quantization"], config["metric"])
+        with self._lock:
+            if self._migrating:
+                raise RuntimeError("An index rebuild is already in progress")
+            snapshot = self._live_snapshot()
+            purged = np.sort(snapshot[1])
+            self._migrating = True
+            self._migration_backlog = []
+
+        if background:
+            threading.Thread(target=self._run_migration, args=(index_type, snapshot, purged, params), daemon=True).start()
+        else:
+            self._run_migration(index_type, snapshot, purged, params)
+
+    def _run_migration(self, index_type: str, snapshot: tuple, purged: np.ndarray, params):
+        succeeded = False
+        try:
+            started = time.perf_counter()
+            ids, vectors = self._live_vectors(*snapshot)
+            config = {**self.index_params, **params}
+            if len(vectors) < min_train_vectors(index_type, config["quantization"]):
+                # Too few vectors left to train on: fall back to a flat index, as a new store
+                # does, which _maybe_migrate promotes once enough vectors exist again
+                logger.info(f"Only {len(vectors)} vectors to rebuild from; using a flat index until {index_type} can be trained")
+                new_index = with_ids(build_index("flat", self.dimension, metric=config["metric"]))
+            else:
+                new_index = with_ids(build_index(index_type, self.dimension, len(vectors), **config))
+            populate_index(new_index, vectors, ids)
+
+            with self._lock:
+                for backlog_ids, backlog in self._migration_backlog:
+                    new_index.add_with_ids(prepare_vectors(backlog, metric_of(new_index)), backlog_ids)
+                self.index = new_index
+                self._index_mapped = False
+                self.index_type = index_type
+                self.index_params.update(params)
+                self._migration_backlog = None
+                self._tombstones.difference_update(purged.tolist())
+                self._tombstone_selector = None
+
+            logger.info(f"Rebuilt {index_type} index with {new_index.ntotal} vectors in {time.perf_counter() - started:.2f}s")
+
+            if self.storage:
+                if len(purged):
+                    # Copy the bulk of the log without the lock, then the tail appended meanwhile with it
+                    processed = self.storage.begin_log_compaction(purged)
+                    with self._lock:
+                        self.storage.finish_log_compaction(processed, purged)
+                self.metadata_store.purge(purged)
+                self.checkpoint()
+            elif len(purged):
+                self.metadata_store.purge(purged)
+            self._lexical_remove(purged)
+
+            if len(purged):
+                logger.info(f"Compacted {len(purged)} deleted chunks")
+            succeeded = True
+        except Exception as e:
+            logger.error(f"Rebuild as {index_type} index failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._migrating = False
+                self._migration_backlog = None
+            # Chunks deleted during the rebuild were kept; compact them now rather than at
+            # the next delete. A failed rebuild is not retried, or it would loop.
+            if succeeded:
+                self._maybe_compact()
+
+    def get_index_info(self):
+        """
+        Returns the active and configured index types and their size.
+        """
+        return {
+            "index_type": index_type_of(self.index),
+            "target_index_type": self.index_type,
+            "quantization": quantization_of(self.index),
+            "target_quantization": self.index_params["quantization"],
+            "rescore": self.rescore,
+            "metric": metric_of(self.index),
+            "target_metric": self.index_params["metric"],
+            "min_similarity": self.min_similarity,
+            "adaptive_k_gap": self.adaptive_k_gap,
+            "vectors": self.index.ntotal + (self._tail.ntotal if self._tail is not None else 0),
+            "role": "reader" if self.read_only else "writer",
+            "state": self.state,
+            "generation": self._generation,
+            "migrating": self._migrating,
+            "load_seconds": self.load_seconds,
+            "deleted_chunks": len(self._tombstones),
+            "nprobe": self.nprobe,
+            "ef_search": self.ef_search,
+            "search_mode": self.search_mode,
+            "lexical": {"state": self.lexical_state, **self.lexical_index.get_stats()},
+        }
+
+    def recall_report(self, queries: Optional[List[str]] = None, k: int = 10, sample_size: int = 100):
+        """
+        Compares the active index against an exact flat search.
+
+        Args:
+            queries: Query texts to evaluate; defaults to a sample of stored vectors.
+            k: Number of neighbours compared.
+            sample_size: Stored vectors sampled as queries when none are given.
+        """
+        self._wait_loaded()
+        with self._lock:
+            snapshot = self._live_snapshot()
+            index = self.index
+            selector = self._tombstone_filter()
+        ids, vectors = self._live_vectors(*snapshot)
+        vectors = np.array(vectors)
+
+        queries = self._report_queries(queries, vectors, sample_size)
+        with self._index_lock.read():
+            return recall_report(index, vectors, queries, ids, k, selector)
+
+    def quantization_report(
+        self,
+        queries: Optional[List[str]] = None,
+        k: int = 10,
+        sample_size: int = 100,
+        quantizations: List[str] = QUANTIZATIONS,
+        rescore_factors: List[int] = (4,),
+    ):
+        """
+        Reports the memory saved and the recall@k lost by each quantization of the stored vectors.
+
+        Args:
+            queries: Query texts to evaluate; defaults to a sample of stored vectors.
+            k: Number of neighbours compared.
+            sample_size: Stored vectors sampled as queries when none are given.
+            quantizations: Quantizations to compare.
+            rescore_factors: Re-scoring settings measured besides no re-scoring.
+        """
+        self._wait_loaded()
+        for quantization in quantizations:
+            check_index_config("flat", quantization)
+        with self._lock:
+            snapshot = self._live_snapshot()
+            metric = metric_of(self.index)
+        _, vectors = self._live_vectors(*snapshot)
+        vectors = np.array(vectors)
+
+        return quantization_report(vectors, self._report_queries(queries, vectors, sample_size), k, quantizations, rescore_factors, metric)
+
+    def _report_queries(self, queries: Optional[List[str]], vectors: np.ndarray, sample_size: int) -> np.ndarray:
+        if queries:
+            return self.embed_queries(queries)
+        rng = np.random.default_rng(0)
+        return vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
 
     def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generates an embedding for the given text.
         """
-        return self.model.encode(text, convert_to_numpy=True)
+        if self.embedding_cache:
+            cached = self.embedding_cache.get_many([text])[0]
+            if cached is not None:
+                EMBEDDING_CACHE_HITS.inc()
+                return cached
 
-    def store_embeddings(self, text_chunks):
+        with metrics.span("embed"):
+            embedding = self.model.encode(text, convert_to_numpy=True)
+        EMBEDDED_TEXTS.inc()
+        if self.embedding_cache:
+            self.embedding_cache.put_many([text], embedding.reshape(1, -1))
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeds search queries, without counting them in the ingestion throughput stats.
+        """
+        if len(queries) == 1:
+            return self.generate_embedding(queries[0]).reshape(1, -1)
+        return self.generate_embeddings(queries, track_stats=False)
+
+    def generate_embeddings(self, texts: List[str], batch_size: int = None, track_stats: bool = True) -> np.ndarray:
+        """
+        Generates embeddings for a list of texts, encoding them in batches.
+
+        Args:
+            texts: The texts to embed.
+            batch_size: Texts per forward pass (defaults to the store's batch_size).
+            track_stats: Count the batches in the ingestion throughput stats.
+
+        Returns:
+            A float32 array of shape (len(texts), embedding_dimension).
+        """
+        batch_size = batch_size or self.batch_size
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        # Only texts missing from the cache go through the encoder
+        missing = list(range(len(texts)))
+        if self.embedding_cache:
+            cached = self.embedding_cache.get_many(texts)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    embeddings[i] = vector
+            EMBEDDING_CACHE_HITS.inc(len(texts) - len(missing))
+
+        for start in range(0, len(missing), batch_size):
+            positions = missing[start:start + batch_size]
+            batch = [texts[i] for i in positions]
+            with metrics.span("embed") as span:
+                encoded = self.model.encode(batch, batch_size=batch_size, convert_to_numpy=True)
+            elapsed = span.seconds
+            EMBEDDED_TEXTS.inc(len(batch))
+            embeddings[positions] = encoded
+            if self.embedding_cache:
+                self.embedding_cache.put_many(batch, encoded)
+
+            if not track_stats:
+                continue
+            self.embedding_stats["batches"] += 1
+            self.embedding_stats["chunks"] += len(batch)
+            self.embedding_stats["seconds"] += elapsed
+            logger.info(f"Embedded batch of {len(batch)} chunks in {elapsed:.3f}s ({len(batch) / max(elapsed, 1e-9):.1f} chunks/s)")
+
+        return embeddings
+
+    def get_embedding_stats(self):
+        """
+        Returns cumulative ingestion throughput counters.
+        """
+        stats = dict(self.embedding_stats)
+        stats["chunks_per_second"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+        stats["backend"] = self.embedding_backend
+        if self.embedding_cache:
+            stats["cache"] = self.embedding_cache.get_stats()
+        return stats
+
+    def has_file(self, content_hash: str) -> bool:
+        """
+        Returns True if a file with this content hash has already been ingested.
+        """
+        self._wait_loaded()
+        return content_hash in self._file_hashes
+
+    def complete_file(self, file_id: str, content_hash: str):
+        """
+        Registers the content hash of a file once all of its chunks are stored, so
+        ``has_file`` only rejects uploads of files that were ingested in full.
+        """
+        self._wait_loaded()
+        self._require_writer()
+        with self._lock:
+            self.metadata_store.set_file_hash(file_id, content_hash)
+            self._file_hashes.add(content_hash)
+
+    def store_embeddings(self, text_chunks, batch_size: int = None):
         """
         Generates embeddings for text chunks and stores them in the FAISS vector database with metadata.
+
+        Chunks are encoded in batches of ``batch_size`` rather than one forward pass per chunk.
+        Every file gets a row for each of its chunks (a chunk repeated within a file is
+        stored once), but only chunks whose content hash is not stored yet are embedded;
+        the others reuse their logged vectors. Re-uploading a document thus only embeds
+        the chunks that changed, and deleting one copy leaves the other files intact.
         """
-        embeddings = []
+        self._wait_loaded()
+        self._require_writer()
+        if not text_chunks:
+            return {"status": "success", "processed_chunks": 0, "embedded_chunks": 0, "duplicate_chunks": 0}
+
+        new_chunks = []
+        seen = set()
         for chunk in text_chunks:
-            embedding = self.generate_embedding(chunk["text"])
-            embeddings.append(embedding)
-            
-            # Store metadata separately in list (keeping index order consistent)
-            self.metadata_store.append({
-                "id": str(uuid.uuid4()),
-                "filename": chunk["metadata"]["filename"],
-                "page_number": chunk["metadata"].get("page_number", "N/A"),
-                "text": chunk["text"]
-            })
-
-        # Convert embeddings list to numpy array and add to FAISS index
-        self.index.add(np.array(embeddings))
-
-        return {"status": "success", "processed_chunks": len(text_chunks)}
-
-    def search(self, query: str, top_k: int = 5):
-        query_embedding = self.generate_embedding(query).reshape(1, -1)
-        distances, indices = self.index.search(query_embedding, top_k)
-    
+            chunk_hash = chunk["metadata"].get("chunk_hash") or hash_text(chunk["text"])
+            if (chunk["metadata"].get("file_id"), chunk_hash) in seen:
+                continue
+            seen.add((chunk["metadata"].get("file_id"), chunk_hash))
+            new_chunks.append((chunk_hash, chunk))
+        if not new_chunks:
+            return {"status": "success", "processed_chunks": len(text_chunks), "embedded_chunks": 0, "duplicate_chunks": len(text_chunks)}
+
+        embeddings, embedded = self._chunk_vectors(new_chunks, batch_size)
+        result = {
+            "status": "success",
+            "processed_chunks": len(text_chunks),
+            "embedded_chunks": embedded,
+            "duplicate_chunks": len(text_chunks) - embedded,
+        }
+        STORED_CHUNKS.inc(result["duplicate_chunks"], outcome="duplicate")
+        STORED_CHUNKS.inc(result["embedded_chunks"], outcome="embedded")
+
+        # Store metadata separately (keeping index order consistent)
+        entries = [{
+            "id": str(uuid.uuid4()),
+            "filename": chunk["metadata"]["filename"],
+            "page_number": chunk["metadata"].get("page_number", "N/A"),
+            "text": chunk["text"],
+            "file_id": chunk["metadata"].get("file_id"),
+            "chunk_hash": chunk_hash,
+            "file_hash": None,  # Set by complete_file once the whole file is stored
+            "uploaded_at": chunk["metadata"].get("uploaded_at") or time.time(),
+        } for chunk_hash, chunk in new_chunks]
+        # Tokenized for BM25 here, so searches waiting on the lock below only wait for the merge
+        counts = term_counts(entry["text"] for entry in entries)
+
+        with self._lock, metrics.span("index_add"):
+            ids = np.arange(self._next_id, self._next_id + len(entries), dtype=np.int64)
+            self._next_id += len(entries)
+
+            if self._index_mapped:
+                # The first upload after a memory-mapped start needs a writable copy
+                self.index = self.storage.load_index()
+                self._index_mapped = False
+                logger.info("Loaded a writable copy of the memory-mapped index")
+            if self.storage:
+                self.storage.append_vectors(ids, embeddings)
+            self.metadata_store.extend(ids, entries)
+            self._lexical_add(ids, counts)
+            self.file_index.add(ids, entries)
+
+            # The log and a migration's backlog keep the raw embeddings; each index gets
+            # them prepared for its own metric, which a migration may be changing
+            with self._index_lock.write():
+                self.index.add_with_ids(prepare_vectors(embeddings, metric_of(self.index)), ids)
+                self._unsaved_vectors += len(entries)
+            for chunk_id, entry in zip(ids.tolist(), entries):
+                self._chunk_rows[entry["chunk_hash"]] = chunk_id
+            if self._migration_backlog is not None:
+                self._migration_backlog.append((ids, embeddings))
+
+            checkpoint_due = self.storage is not None and self._unsaved_vectors >= self.checkpoint_interval
+            if not checkpoint_due:
+                self._publish()
+
+        # Written outside the lock; the checkpoint publishes this batch with it
+        if checkpoint_due:
+            self.checkpoint()
+        self._maybe_migrate()
+
+        return result
+
+    def _chunk_vectors(self, chunks, batch_size: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """
+        Returns the raw embeddings of (chunk_hash, chunk) pairs and how many were encoded.
+
+        Chunks already stored reuse the vectors logged for them; the others, and every
+        chunk when there is no vector log, go to ``generate_embeddings`` (and its cache)
+        once per distinct content hash.
+        """
+        hashes = [chunk_hash for chunk_hash, _ in chunks]
+        embeddings = np.empty((len(chunks), self.dimension), dtype=np.float32)
+        found = np.zeros(len(chunks), dtype=bool)
+        if self.storage:
+            stored_ids = np.array([self._chunk_rows.get(chunk_hash, -1) for chunk_hash in hashes], dtype=np.int64)
+            if (stored_ids >= 0).any():
+                # A row deleted and compacted away meanwhile is simply not found, and encoded again
+                found, vectors = self.storage.read_vectors(stored_ids)
+                found &= stored_ids >= 0
+                embeddings[found] = vectors[found]
+
+        missing = {}
+        for position in np.flatnonzero(~found).tolist():
+            missing.setdefault(hashes[position], []).append(position)
+        if missing:
+            encoded = self.generate_embeddings([chunks[positions[0]][1]["text"] for positions in missing.values()], batch_size)
+            for vector, positions in zip(encoded, missing.values()):
+                embeddings[positions] = vector
+        return embeddings, len(missing)
+
+    def delete_file(self, file_id: str):
+        """
+        Deletes every chunk of a file.
+
+        The chunks are tombstoned immediately, so searches stop returning them, and are
+        removed from the index and from disk by the next compaction. Other files holding
+        the same chunk content keep their own rows.
+        """
+        self._wait_loaded()
+        self._require_writer()
+        with self._lock:
+            rows = self.metadata_store.file_chunks(file_id)
+            if not rows:
+                return {"file_id": file_id, "deleted_chunks": 0}
+
+            chunk_ids = [row[0] for row in rows]
+            self.metadata_store.mark_deleted(chunk_ids)
+            self.file_index.remove_file(file_id)
+            self._tombstones.update(chunk_ids)
+            self._tombstone_selector = None
+            self._publish()
+
+            for chunk_id, chunk_hash, file_hash in rows:
+                if chunk_hash and self._chunk_rows.get(chunk_hash) == chunk_id:
+                    del self._chunk_rows[chunk_hash]
+                if file_hash:
+                    self._file_hashes.discard(file_hash)
+
+        logger.info(f"Deleted {len(chunk_ids)} chunks of file {file_id}")
+        self._maybe_compact()
+        return {"file_id": file_id, "deleted_chunks": len(chunk_ids)}
+
+    def list_files(self):
+        """
+        Returns file_id, filename, upload time and chunk count for every stored file.
+        """
+        self._wait_loaded()
+        return self.file_index.files()
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        mode: Optional[str] = None,
+        filters: Optional[Dict] = None,
+        min_similarity: Optional[float] = None,
+        adaptive_k_gap: Optional[float] = None,
+    ):
+        """
+        Returns the top_k chunks most relevant to the query.
+
+        nprobe (IVF) and ef_search (HNSW) override the store defaults for this query only.
+        ``mode`` overrides the store's search mode (see SEARCH_MODES). Dense hits carry
+        their ``distance`` (l2) or cosine ``similarity``, lexical hits their BM25
+        ``lexical_score``, and fused hits their reciprocal-rank ``score``. Hits with
+        identical text are collapsed into the best-ranked one.
+
+        ``filters`` (see FileIndex.select) restrict the search to matching chunks
+        before ranking, so filtered queries only score the selected chunks.
+
+        With the cosine metric, ``min_similarity`` and ``adaptive_k_gap`` override the
+        store's cut-offs for weak dense hits, so fewer than top_k chunks may be returned.
+        Lexical hits matched query terms and are kept.
+        """
+        return self.search_batch([query], top_k, nprobe, ef_search, mode, filters, min_similarity, adaptive_k_gap)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        mode: Optional[str] = None,
+        filters: Optional[Dict] = None,
+        min_similarity: Optional[float] = None,
+        adaptive_k_gap: Optional[float] = None,
+    ) -> List[List[Dict]]:
+        """
+        Runs ``search`` for several queries at once.
+
+        The queries are encoded in batches and, except in prefilter mode (where
+        every query has its own candidate set), searched with a single FAISS call
+        over the query matrix.
+        """
+        self._wait_loaded()
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}. Supported modes are: {', '.join(SEARCH_MODES)}")
+        if (min_similarity is not None or adaptive_k_gap is not None) and self.index_params["metric"] != "cosine":
+            raise ValueError("min_similarity and adaptive_k_gap need the cosine metric")
+        min_similarity = self.min_similarity if min_similarity is None else min_similarity
+        adaptive_k_gap = self.adaptive_k_gap if adaptive_k_gap is None else adaptive_k_gap
+        if not queries:
+            return []
+
+        allowed = None
+        if filters:
+            allowed = self.file_index.select(filters)
+            if not len(allowed):
+                return [[] for _ in queries]
+
+        # Over-fetch so collapsing duplicates can still fill top_k
+        fetch_k = top_k * 2
+        dense = [{} for _ in queries]
+        lexical = [{} for _ in queries]
+
+        # Hybrid fusion looks deeper into both rankings; the prefilter keeps a wide
+        # lexical candidate set for the dense search to re-rank
+        depth = {"dense": fetch_k, "lexical": fetch_k, "hybrid": fetch_k * 2, "prefilter": max(fetch_k, self.lexical_candidates)}[mode]
+
+        if mode != "dense":
+            self._lexical_ready.wait()
+            if self.lexical_state == "failed":
+                raise RuntimeError("The lexical index failed to build; use the dense search mode")
+            include = set(allowed.tolist()) if allowed is not None else None
+            with metrics.span("lexical_search"):
+                lexical = [dict(self.lexical_index.search(query, depth, exclude=self._tombstones, include=include)) for query in queries]
+
+        if mode != "lexical":
+            embeddings = self.embed_queries(queries)
+
+        metric = "l2"
+        if mode == "prefilter":
+            for i, candidates in enumerate(lexical):
+                # Without lexical candidates, fall back to a dense search over everything allowed
+                restrict = np.fromiter(candidates, dtype=np.int64) if candidates else allowed
+                hits, metric = self._dense_search(embeddings[i:i + 1], fetch_k, nprobe, ef_search, restrict)
+                dense[i] = hits[0]
+        elif mode != "lexical":
+            dense, metric = self._dense_search(embeddings, depth, nprobe, ef_search, restrict=allowed)
+
+        if metric == "cosine" and (min_similarity is not None or adaptive_k_gap is not None):
+            dense = [self._cut_weak_hits(hits, min_similarity, adaptive_k_gap) for hits in dense]
+
+        return [self._collect(mode, d, l, top_k, metric) for d, l in zip(dense, lexical)]
+
+    @staticmethod
+    def _cut_weak_hits(hits: Dict[int, float], min_similarity: Optional[float], gap: Optional[float]) -> Dict[int, float]:
+        """
+        Keeps the leading hits (best first) down to ``min_similarity``, stopping early at
+        the first drop of at least ``gap`` in similarity between consecutive hits.
+        """
+        kept = {}
+        previous = None
+        for chunk_id, similarity in hits.items():
+            if min_similarity is not None and similarity < min_similarity:
+                break
+            if gap is not None and previous is not None and previous - similarity >= gap:
+                break
+            kept[chunk_id] = similarity
+            previous = similarity
+        return kept
+
+    def _collect(self, mode: str, dense: Dict[int, float], lexical: Dict[int, float], top_k: int, metric: str = "l2") -> List[Dict]:
+        """Ranks one query's dense and lexical hits and attaches their metadata."""
+        if mode == "hybrid":
+            ranked = reciprocal_rank_fusion([list(dense), list(lexical)])
+        elif mode == "lexical":
+            ranked = list(lexical.items())
+        else:
+            ranked = [(chunk_id, None) for chunk_id in dense]
+
         results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx == -1 or idx >= len(self.metadata_store):
+        seen = set()
+        for idx, score in ranked:
+            if idx in self._tombstones:
+                continue
+
+            try:
+                metadata = self.metadata_store[idx]
+            except IndexError:
                 continue
-            
-            metadata = self.metadata_store[idx]
-            results.append({
+            chunk_hash = metadata.get("chunk_hash") or hash_text(metadata["text"])
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+
+            result = {
+                "chunk_id": int(idx),
+                "file_id": metadata.get("file_id"),
                 "filename": metadata["filename"],
                 "page_number": metadata["page_number"],
                 "text": metadata["text"],
-                "distance": float(distance)  # Convert numpy.float32 to Python float
-            })
-    
+            }
+            if idx in dense:
+                result["similarity" if metric == "cosine" else "distance"] = dense[idx]
+            if idx in lexical:
+                result["lexical_score"] = lexical[idx]
+            if mode == "hybrid":
+                result["score"] = score
+            results.append(result)
+            if len(results) == top_k:
+                break
+
         return results
-    
 
+    def _dense_search(
+        self,
+        embeddings: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        restrict: Optional[np.ndarray] = None,
+    ) -> Tuple[List[Dict[int, float]], str]:
+        """
+        Returns {chunk_id: score} for the k nearest chunks of each query row, in rank
+        order, and the metric of the scores (l2 distances or cosine similarities).
+
+        ``restrict`` limits the search to the given chunk ids (which must exclude
+        deleted chunks); otherwise deleted chunks are filtered out.
+        """
+        # Only the current index, its tail and the deletion filter are taken under the lock;
+        # the search itself runs concurrently with other searches
+        with self._lock:
+            index, tail = self.index, self._tail
+            if restrict is None:
+                selector = self._tombstone_filter()
+        metric = metric_of(index)
+        embeddings = prepare_vectors(embeddings, metric)
+        selectivity = 1.0
+        if restrict is not None:
+            restrict = np.ascontiguousarray(restrict, dtype=np.int64)
+            if self.storage is not None and index_type_of(index) != "flat" and len(restrict) <= self.filter_exact_limit:
+                with metrics.span("exact_search"):
+                    found, vectors = self.storage.read_vectors(restrict)
+                    distances, indices = exact_search(embeddings, np.where(found, restrict, -1), vectors, k, metric)
+                return self._hit_dicts(indices, distances), metric
+            selector = faiss.IDSelectorBatch(len(restrict), faiss.swig_ptr(restrict))
+            selectivity = len(restrict) / max(index.ntotal + (tail.ntotal if tail is not None else 0), 1)
+        # Compressed codes only shortlist candidates; their logged full-precision vectors rank them
+        rescore = self.rescore > 1 and self.storage is not None and is_compressed(index)
+        fetch_k = k * self.rescore if rescore else k
+        params = search_params(index, nprobe or self.nprobe, ef_search or self.ef_search, selector, selectivity)
+        with self._index_lock.read(), metrics.span("faiss_search"):
+            distances, indices = index.search(embeddings, fetch_k, params=params)
+            if tail is not None and tail.ntotal:
+                # Merge in the vectors a reader has not seen in a checkpoint yet
+                tail_distances, tail_indices = tail.search(embeddings, fetch_k, params=search_params(tail, selector=selector))
+                distances = np.hstack([distances, tail_distances])
+                indices = np.hstack([indices, tail_indices])
+                order = rank_order(distances, metric)[:, :fetch_k]
+                distances = np.take_along_axis(distances, order, axis=1)
+                indices = np.take_along_axis(indices, order, axis=1)
+
+        if rescore:
+            with metrics.span("rescore"):
+                found, vectors = self.storage.read_vectors(indices)
+                distances, indices = exact_rerank(embeddings, np.where(found, indices, -1), vectors, k, metric)
+        return self._hit_dicts(indices, distances), metric
+
+    @staticmethod
+    def _hit_dicts(indices: np.ndarray, distances: np.ndarray) -> List[Dict[int, float]]:
+        # Convert numpy.float32 to Python float
+        return [
+            {int(idx): float(distance) for idx, distance in zip(row_indices, row_distances) if idx != -1}
+            for row_indices, row_distances in zip(indices, distances)
+        ]
 
     def get_index(self):
         """
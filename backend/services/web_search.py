@@ -1,10 +1,15 @@
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator, Optional, Tuple
 from duckduckgo_search import DDGS
+import asyncio
+import httpx
 import requests
 from bs4 import BeautifulSoup
-import time
 from urllib.parse import urlparse
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
 def search_web(keywords: str, max_results: int = 5) -> List[Dict]:
     """
     Perform a web search using DuckDuckGo for the given keywords.
@@ -27,6 +32,24 @@ def search_web(keywords: str, max_results: int = 5) -> List[Dict]:
         print(f"Error performing web search: {str(e)}")
         return []
 
+def _parse_html(html: str) -> Tuple[str, str]:
+    """
+    Extract the title and visible text from an HTML document.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    # Get title
+    title = soup.title.string if soup.title else "No title found"
+    
+    # Get text content
+    text = soup.get_text(separator=' ', strip=True)
+    
+    return title, text
+
 def extract_text_from_url(url: str, timeout: int = 10) -> Dict:
     """
     Extract text content from a given URL.
@@ -42,25 +65,11 @@ def extract_text_from_url(url: str, timeout: int = 10) -> Dict:
             - status: HTTP status code
             - error: Error message if any
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = requests.get(url, headers=HEADERS, timeout=timeout)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get title
-        title = soup.title.string if soup.title else "No title found"
-        
-        # Get text content
-        text = soup.get_text(separator=' ', strip=True)
+        title, text = _parse_html(response.text)
         
         return {
             'title': title,
@@ -76,33 +85,170 @@ def extract_text_from_url(url: str, timeout: int = 10) -> Dict:
             'error': str(e)
         }
 
-def crawl_search_results(keywords: str, max_results: int = 5, delay: float = 1.0) -> List[Dict]:
+def crawl_search_results(
+    keywords: str,
+    max_results: int = 5,
+    delay: float = 1.0,
+    max_concurrency: int = 5,
+    deadline: float = 30.0
+) -> List[Dict]:
     """
     Perform a web search and crawl through the results to extract content.
     
+    Pages are fetched concurrently; ``delay`` only spaces out requests to the same host.
+    
     Args:
         keywords (str): The search query/keywords
         max_results (int): Maximum number of results to process
-        delay (float): Delay between requests in seconds to be respectful to servers
+        delay (float): Minimum delay between requests to the same host in seconds
+        max_concurrency (int): Maximum number of requests in flight
+        deadline (float): Overall time budget for crawling in seconds
     
     Returns:
-        List[Dict]: List of dictionaries containing search results and their content:
+        List[Dict]: List of dictionaries containing search results and their content,
+        in completion order:
             - search_result: Original search result
             - content: Extracted content from the webpage
     """
-    search_results = search_web(keywords, max_results)
-    crawled_results = []
+    async def collect():
+        return [
+            crawled async for crawled in
+            crawl_search_results_async(keywords, max_results, delay, max_concurrency, deadline)
+        ]
+    
+    return asyncio.run(collect())
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least ``min_interval`` seconds,
+    while requests to different hosts proceed in parallel.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, host: str):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def extract_text_from_url_async(client: httpx.AsyncClient, url: str, timeout: float = 10) -> Dict:
+    """
+    Async counterpart of extract_text_from_url using a shared pooled client.
     
-    for result in search_results:
-        # Add delay between requests
-        time.sleep(delay)
+    Args:
+        client (httpx.AsyncClient): Client whose connection pool is reused across requests
+        url (str): The URL to extract content from
+        timeout (float): Request timeout in seconds
+    
+    Returns:
+        Dict: Same shape as extract_text_from_url
+    """
+    try:
+        response = await client.get(url, timeout=timeout)
+        response.raise_for_status()
         
+        # HTML parsing is CPU-bound, keep it off the event loop
+        title, text = await asyncio.to_thread(_parse_html, response.text)
+        
+        return {
+            'title': title,
+            'text': text,
+            'status': response.status_code,
+            'error': None
+        }
+    except Exception as e:
+        return {
+            'title': None,
+            'text': None,
+            'status': e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None,
+            'error': str(e)
+        }
+
+async def crawl_urls(
+    search_results: List[Dict],
+    delay: float = 1.0,
+    max_concurrency: int = 5,
+    deadline: float = 30.0,
+    timeout: float = 10,
+    client: Optional[httpx.AsyncClient] = None
+) -> AsyncIterator[Dict]:
+    """
+    Crawl the links of the given search results concurrently, yielding each result as it completes.
+    
+    Args:
+        search_results (List[Dict]): Search results with a 'link' key
+        delay (float): Minimum delay between requests to the same host in seconds
+        max_concurrency (int): Maximum number of requests in flight
+        deadline (float): Overall time budget in seconds; unfinished pages are reported as errors
+        timeout (float): Per-request timeout in seconds
+        client (httpx.AsyncClient): Optional client to reuse, e.g. one pointed at a test server
+    
+    Yields:
+        Dict: {'search_result': ..., 'content': ...} in completion order
+    """
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_concurrency)
+        )
+    
+    rate_limiter = HostRateLimiter(delay)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def crawl_one(result: Dict) -> Dict:
         url = result['link']
-        content = extract_text_from_url(url)
+        # Wait for the host's slot before taking a concurrency slot, so tasks
+        # sleeping on one busy host do not block fetches from other hosts
+        await rate_limiter.wait(urlparse(url).netloc)
+        async with semaphore:
+            content = await extract_text_from_url_async(client, url, timeout)
+        return {'search_result': result, 'content': content}
+    
+    tasks = {asyncio.create_task(crawl_one(result)): result for result in search_results}
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+    
+    try:
+        pending = set(tasks)
+        while pending:
+            remaining = expires - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
         
-        crawled_results.append({
-            'search_result': result,
-            'content': content
-        })
+        for task in pending:
+            task.cancel()
+            yield {
+                'search_result': tasks[task],
+                'content': {'title': None, 'text': None, 'status': None, 'error': 'Crawl deadline exceeded'}
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+        if owns_client:
+            await client.aclose()
+
+async def crawl_search_results_async(
+    keywords: str,
+    max_results: int = 5,
+    delay: float = 1.0,
+    max_concurrency: int = 5,
+    deadline: float = 30.0
+) -> AsyncIterator[Dict]:
+    """
+    Perform a web search and crawl the results concurrently, yielding each as it completes.
     
-    return crawled_results
+    See crawl_urls for the meaning of the crawl arguments.
+    """
+    search_results = await asyncio.to_thread(search_web, keywords, max_results)
+    async for crawled in crawl_urls(search_results, delay, max_concurrency, deadline):
+        yield crawled
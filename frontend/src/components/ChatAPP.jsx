@@ -10,6 +10,24 @@ const ChatApp = () => {
   const [loading, setLoading] = useState(false);
   const [uploadStatus, setUploadStatus] = useState(null);
 
+  const pollJob = async (jobId, results) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const response = await fetch(`http://localhost:8000/jobs/${jobId}`);
+      if (!response.ok) {
+        // e.g. 404 once a restart has cleared the in-memory job store
+        setUploadStatus({ message: `Lost track of the upload job (HTTP ${response.status})`, error: true, results });
+        return;
+      }
+      const job = await response.json();
+      setUploadStatus({
+        message: `Processing files: ${job.status}`,
+        results: [...results, ...job.files]
+      });
+      if (job.status === 'completed' || job.status === 'failed') return;
+    }
+  };
+
   const handleFileUpload = async (event) => {
     const formData = new FormData();
     Array.from(event.target.files).forEach(file => {
@@ -23,8 +41,13 @@ const ChatApp = () => {
         body: formData
       });
       const data = await response.json();
-      setUploadStatus(data);
-      setFiles(prev => [...prev, ...Array.from(event.target.files)]);
+      if (!response.ok) {
+        setUploadStatus({ message: data.detail || 'Upload failed', error: true });
+      } else {
+        setUploadStatus(data);
+        setFiles(prev => [...prev, ...Array.from(event.target.files)]);
+        if (data.job_id) await pollJob(data.job_id, data.results);
+      }
     } catch (error) {
       setUploadStatus({ message: 'Upload failed', error: error.message });
     }